@@ -4,12 +4,15 @@
 #author          :Vincentius Martin
 #date            :-
 #version         :0.1
-#usage           :usage here
+#usage           :python bench_generator.py [-c count] [-o out.npy]
 #==============================================================================
 
-from random import randint
+import sys
 import argparse
 
+from smrsim.generator import PATTERNS, TraceGenerator, writeGeneratedTrace
+from smrsim.trace import writeTextTrace
+
 parser = argparse.ArgumentParser()
 parser.add_argument("-r","--readsize", help="read size in KB", type=int, default=1024)
 parser.add_argument("-w","--writesize", help="write size in KB", type=int, default=4)
@@ -17,24 +20,38 @@ parser.add_argument("-t","--itertime", help="time in sec per 1 iteration", type=
 parser.add_argument("-n","--numwrites", help="number of write every 1 iteration", type=int, default=2)
 parser.add_argument("-i","--iter", help="how many iterations", type=int, default=100)
 parser.add_argument("-d","--disksize", help="disk size in GB", type=int, default=800)
-args = parser.parse_args()
+parser.add_argument("-c","--count", help="generate count requests of a read/write mix instead of iterations", type=int, default=None)
+parser.add_argument("-m","--readratio", help="share of reads in the mix", type=float, default=0.5)
+parser.add_argument("-e","--interval", help="ms between requests of the mix", type=float, default=1.0)
+parser.add_argument("-p","--poisson", help="exponential times between requests of the mix", action='store_true')
+parser.add_argument("-a","--address", help="address pattern: " + ",".join(PATTERNS), choices=PATTERNS, default="uniform")
+parser.add_argument("-z","--zipf", help="zipf exponent (above 1) of the zipf address pattern", type=float, default=1.2)
+parser.add_argument("-q","--runlength", help="average requests per run of the sequential address pattern", type=float, default=64)
+parser.add_argument("-s","--seed", help="random seed, the same seed gives the same trace", type=int, default=None)
+parser.add_argument("-o","--output", help="trace file, binary if it ends with .npy, stdout when omitted", type=str, default=None)
 
 #==============================================================================
 
-DISK_SIZE = args.disksize * 2097152 #sectors
-READ_SIZE = args.readsize * 2 #sectors
-WRITE_SIZE = args.writesize * 2 #sectors
-iter_time = args.itertime * 1000
-time = 0.0;
-readtime = 10
+# Requests are generated by smrsim.generator a chunk at a time, also usable straight from python:
+#   sim.run(chunkEvents(TraceGenerator(disksize, pattern="zipf", seed=1).mixChunks(10 ** 6)))
 
 #==============================================================================
 
 if __name__ == "__main__":
-    for i in range(0,args.iter):
-        print(str(readtime) + " 0 " + str(randint(0,DISK_SIZE)) + " " + str(READ_SIZE) + " 1")
-        readtime += 1000
-        for y in range(0,args.numwrites):
-            time += round((iter_time / args.numwrites),3)
-            print(str(time) + " 0 " + str(randint(0,DISK_SIZE)) + " " + str(WRITE_SIZE) + " 0")
-            
+    args = parser.parse_args()
+
+    generator = TraceGenerator(args.disksize * 2097152, #sectors
+                               read_size=args.readsize * 2, write_size=args.writesize * 2, #sectors
+                               pattern=args.address, zipf_a=args.zipf, run_length=args.runlength,
+                               interval=args.interval, poisson=args.poisson, seed=args.seed)
+    if args.count is not None:
+        count = args.count
+        chunks = generator.mixChunks(count, args.readratio)
+    else:
+        count = args.iter * (1 + args.numwrites)
+        chunks = generator.iterationChunks(args.iter, args.numwrites, args.itertime * 1000)
+
+    if args.output is None:
+        writeTextTrace(sys.stdout, chunks)
+    else:
+        writeGeneratedTrace(args.output, chunks, count)
@@ -0,0 +1,20 @@
+#!/usr/bin/env python
+#title           :build_accel.py
+#description     :Build the optional compiled kernels of smrsim (smrsim/_accel.c) in place
+#usage           :python build_accel.py
+#notes           :needs a C compiler and the python headers, smrsim runs the same without them (see smrsim/accel.py)
+#python_version  :Python 2
+#==============================================================================
+
+# coding: utf-8
+
+import os
+from distutils.core import Extension, setup
+
+#===============================================================================================
+
+# Main
+if __name__ == "__main__":
+    os.chdir(os.path.dirname(os.path.abspath(__file__)))
+    setup(name="smrsim-accel", ext_modules=[Extension("smrsim._accel", ["smrsim/_accel.c"], extra_compile_args=["-O2"])],
+          script_args=["build_ext", "--inplace"])
@@ -0,0 +1,78 @@
+#!/usr/bin/env python
+#title           :smr_bench.py
+#description     :Benchmark the simulators on generated traces: events/s, peak RSS and time per phase
+#usage           :python smr_bench.py -s 100000,1000000 -r bench/after.json -c bench/before.json
+#notes           :one process per run, results saved as json to compare versions
+#python_version  :Python 2 
+#==============================================================================
+
+# coding: utf-8
+
+import json
+import os
+import argparse
+
+from smrsim.bench import GEOMETRIES, PHASES, POLICIES, SIMULATORS, benchCases, benchInfo, benchTrace, compareRows, runBench
+from smrsim.generator import PATTERNS
+from smrsim.output import OUTPUT_EXTS
+
+#===============================================================================================
+
+# Script's arguments
+parser = argparse.ArgumentParser()
+parser.add_argument("-s","--sizes", help="comma separated trace sizes, in requests", type=str, default="100000")
+parser.add_argument("-g","--geometries", help="comma separated geometries among " + ",".join(sorted(GEOMETRIES)), type=str, default="small,default")
+parser.add_argument("-S","--simulators", help="comma separated simulators among " + ",".join(SIMULATORS), type=str, default=",".join(SIMULATORS))
+parser.add_argument("-p","--policies", help="comma separated policies of the multi log simulators", type=str, default=",".join(POLICIES))
+parser.add_argument("-a","--address", help="address pattern of the traces: " + ",".join(PATTERNS), choices=PATTERNS, default="zipf")
+parser.add_argument("-m","--readratio", help="share of reads in the traces", type=float, default=0.5)
+parser.add_argument("-e","--seed", help="random seed of the traces", type=int, default=1)
+parser.add_argument("-b","--binary", help="binary (.npy) traces instead of text", action='store_true')
+parser.add_argument("-o","--output-format", help="text, binary (columnar .cols files) or mapped (fixed-width records in a memory-mapped .rec file, see trace_convert.py)", choices=sorted(OUTPUT_EXTS), default="text")
+parser.add_argument("-n","--no-phases", help="skip the profiled runs giving the time per phase", action='store_true')
+parser.add_argument("-w","--workdir", help="directory of the traces and scratch outputs", type=str, default="bench")
+parser.add_argument("-r","--result", help="json result file, default <workdir>/bench-<version>.json", type=str, default=None)
+parser.add_argument("-c","--compare", help="json result of an earlier run to compare events/s with", type=str, default=None)
+
+#===============================================================================================
+
+# Every run is its own process, one at a time, see smrsim.bench
+
+def splitList(value):
+    return [item for item in value.split(",") if item]
+
+#===============================================================================================
+
+# Main
+if __name__ == "__main__":
+    args = parser.parse_args()
+    if not os.path.isdir(args.workdir):
+        os.makedirs(args.workdir)
+
+    cases = benchCases([int(size) for size in splitList(args.sizes)], splitList(args.geometries),
+                       splitList(args.simulators), splitList(args.policies))
+    traces = [benchTrace(args.workdir, case["events"], case["geometry"], args.binary, args.address, args.readratio, args.seed)
+              for case in cases]
+
+    info = benchInfo()
+    rows = []
+    print("%-40s %10s %8s %8s  %s" % ("case", "events/s", "seconds", "rss MB", " ".join("%8s" % phase for phase in PHASES)))
+    for row in runBench(cases, traces, args.workdir, OUTPUT_EXTS[args.output_format], not args.no_phases):
+        rows.append(row)
+        if row["error"]:
+            print("%-40s failed: %s" % (row["name"], row["error"]))
+        else:
+            print("%-40s %10d %8.3f %8.1f  %s" % (row["name"], row["events_per_sec"], row["seconds"], row["peak_rss_mb"],
+                                                  " ".join("%8.3f" % row["phases"][phase] for phase in PHASES) if "phases" in row else ""))
+
+    result = args.result or os.path.join(args.workdir, "bench-%s.json" % (info["version"] or "unknown"))
+    with open(result, "w") as f:
+        json.dump(dict(info, cases=rows), f, indent=1, sort_keys=True)
+    print("Results: " + result)
+
+    if args.compare:
+        with open(args.compare) as f:
+            old = json.load(f)
+        print("------------Compared with %s------------" % (old.get("version") or args.compare))
+        for name, old_rate, new_rate, speedup in compareRows(old["cases"], rows):
+            print("%-40s %10d -> %10d  %s" % (name, old_rate, new_rate, "x%.2f" % speedup if speedup else "-"))
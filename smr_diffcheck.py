@@ -0,0 +1,66 @@
+#!/usr/bin/env python
+#title           :smr_diffcheck.py
+#description     :Differential check of the vector multi log engine against the reference one
+#usage           :python smr_diffcheck.py in/trace.txt -l 262144 -g 1048576 -b 131072 -d 1073741824
+#notes           :every policy with and without clean (and noclean halting), outputs, summary and final state must match; exit status 1 otherwise
+#python_version  :Python 2
+#precondition    :trace files available
+#==============================================================================
+
+# coding: utf-8
+
+import sys
+import argparse
+
+from smrsim import PLACEMENTS, Config
+from smrsim.bench import NOCLEAN_DISK_FACTOR, POLICIES
+from smrsim.trace import CHUNK_LINES
+from smrsim.vector import compareEngines
+
+#===============================================================================================
+
+# Script's arguments
+parser = argparse.ArgumentParser()
+parser.add_argument("files", help="trace files to check, text or binary (.npy)", nargs='+')
+parser.add_argument("-l","--logsize", help="size of a persistent cache log", type=int, default="10485760")
+parser.add_argument("-g","--group", help="every n group size", type=int, default="104857600")
+parser.add_argument("-b","--bandsize", help="size of band", type=int, default=10485760)
+parser.add_argument("-d","--disksize", help="size of disk", type=int, default=1099511627776)
+parser.add_argument("-p","--policies", help="comma separated policies", type=str, default=",".join(POLICIES))
+parser.add_argument("--placement", help="destination of log swaps: " + ",".join(PLACEMENTS), choices=PLACEMENTS, default="forward")
+parser.add_argument("-s","--split", help="check the cleanup output apart", action='store_true')
+parser.add_argument("-o","--output-format", help="text, or binary (columnar)", choices=["text", "binary"], default="text")
+parser.add_argument("-c","--chunk-lines", help="requests per chunk, small chunks check the chunk boundaries", type=int, default=CHUNK_LINES)
+
+#===============================================================================================
+
+# Test mode: python smr_diffcheck.py in/trace2.txt -l 5120 -g 51200 -b 5120 -d 256000 -c 1000
+# noclean runs get a disk NOCLEAN_DISK_FACTOR times larger, log swaps need empty logs past the traced sectors.
+# "noclean halt" keeps the given disk, where log swaps run out of free logs: both engines must stop at the
+# same request with the same counters and state
+NOCLEAN_CASES = [("", False, 1), (" noclean", True, NOCLEAN_DISK_FACTOR), (" noclean halt", True, 1)] #name, noclean, disk factor
+
+#===============================================================================================
+
+# Main
+if __name__ == "__main__":
+    args = parser.parse_args()
+    base = Config(logsize=args.logsize, group=args.group, bandsize=args.bandsize, disksize=args.disksize, placement=args.placement)
+
+    failed = 0
+    print("%-50s %-10s %10s %10s %8s" % ("case", "result", "scalar s", "vector s", "speedup"))
+    for trace in args.files:
+        for policy in [policy for policy in args.policies.split(",") if policy]:
+            for suffix, noclean, factor in NOCLEAN_CASES:
+                config = base.replace(policy=policy, noclean=noclean, disksize=args.disksize * factor)
+                row = compareEngines(config, trace, args.output_format == "binary", args.split, args.chunk_lines)
+                name = "%s %s%s" % (trace.split('/')[-1], policy, suffix)
+                result = "ok" if not row["mismatch"] else "DIFF " + ",".join(row["mismatch"])
+                print("%-50s %-10s %10.3f %10.3f %8s" % (name, result, row["scalar_seconds"], row["vector_seconds"],
+                                                        "x%.2f" % (row["scalar_seconds"] / row["vector_seconds"]) if row["vector_seconds"] > 0 else "-"))
+                if row["error"]:
+                    print("    both stopped: " + row["error"])
+                failed += 1 if row["mismatch"] else 0
+    print("--------------------------------------")
+    print(str(failed) + " mismatching cases")
+    sys.exit(1 if failed else 0)
@@ -0,0 +1,89 @@
+#!/usr/bin/env python
+#title           :smr_multipolicy.py
+#description     :Simulate smr disk with multiple persistent cache under several policies in one pass
+#notes           :every policy gets its own outputs and summary, same as a run of smr_multipcache.py
+#python_version  :Python 2 
+#precondition    :trace file available
+#==============================================================================
+
+# coding: utf-8
+
+import sys
+import argparse
+from tqdm import *
+
+from smrsim import OUTPUT_EXTS, PLACEMENTS, Config, MultiLogSMR, closeOutputs, openOutput, readTrace, runTogether
+
+#===============================================================================================
+
+# Script's arguments
+parser = argparse.ArgumentParser()
+parser.add_argument("file", help="trace file to process, text (compressed if .gz, .zst or .lz4) or binary (.npy)", nargs='?', type=argparse.FileType('r'), default=sys.stdin)
+parser.add_argument("-l","--logsize", help="size of a persistent cache log", type=int, default="10485760")
+parser.add_argument("-g","--group", help="every n group size", type=int, default="104857600")
+parser.add_argument("-b","--bandsize", help="size of band", type=int, default=10485760)
+parser.add_argument("-d","--disksize", help="size of disk", type=int, default=1099511627776)
+parser.add_argument("-p","--policies", help="comma separated policies, a -noclean suffix disables clean (e.g. A,B,B-noclean)", type=str, default="A,B,C,shelter")
+parser.add_argument("-n","--noclean", help="also run every policy with clean disabled", action='store_true')
+parser.add_argument("-s","--split", help="split the output to 2 traces: w/r to persistent cache and cleanup", action='store_true')
+parser.add_argument("--placement", help="destination of log swaps: " + ",".join(PLACEMENTS), choices=PLACEMENTS, default="forward")
+parser.add_argument("--live", help="track the live copy of every logged sector, live/garbage statistics and occupancy", action='store_true')
+parser.add_argument("-o","--output-format", help="text, binary (columnar .cols files) or mapped (fixed-width records in a memory-mapped .rec file, see trace_convert.py)", choices=sorted(OUTPUT_EXTS), default="text")
+parser.add_argument("-z","--compress", help="compress the text outputs to .gz, .zst or .lz4 files (zstandard, lz4 modules)", choices=["gz", "zst", "lz4"], default=None)
+
+#===============================================================================================
+
+# Test mode: python smr_multipolicy.py in/trace2.txt -l 5120 -g 51200 -b 5120 -d 256000 -p A,B,C,shelter -n
+# Outputs are the ones of smr_multipcache.py with the variant in the name, e.g. out/trace2_B-noclean_smrmultires.txt
+
+def outputName(suffix):
+    return 'out/' + str(sys.argv[1]).strip().split('/')[-1].split('.')[0] + suffix
+
+def variants(args): #(name, policy, noclean) of every simulation to run
+    result = []
+    for name in args.policies.split(","):
+        name = name.strip()
+        policy, noclean = (name[:-len("-noclean")], True) if name.endswith("-noclean") else (name, False)
+        result.append((name, policy, noclean))
+        if args.noclean and not noclean:
+            result.append((name + "-noclean", policy, True))
+    return result
+
+#===============================================================================================
+
+# Main
+if __name__ == "__main__":
+    args = parser.parse_args()
+    if args.compress and args.output_format != "text":
+        parser.error("only text outputs are compressed")
+    config = Config.fromArgs(args)
+
+    # Output file
+    ext = OUTPUT_EXTS[args.output_format] + ('.' + args.compress if args.compress else '')
+    runs = [] #(name, simulator, output files)
+    for name, policy, noclean in variants(args):
+        result = openOutput(outputName('_' + name + '_smrmultires' + ext))
+        result_cleanup = None
+        if args.split:
+            result_cleanup = openOutput(outputName('_' + name + '_smrcleanup' + ext))
+        smr = MultiLogSMR(config.replace(policy=policy, noclean=noclean), result, result_cleanup)
+        runs.append((name, smr, [out for out in (result, result_cleanup) if out is not None]))
+
+    runs[0][1].printConfiguration()
+    try:
+        halted = runTogether([smr for _, smr, _ in runs], tqdm(readTrace(args.file)))
+    finally: #outputs flushed and closed, on an error too
+        closeOutputs([out for _, _, outputs in runs for out in outputs])
+
+    for (name, smr, outputs), halt in zip(runs, halted):
+        print("Policy: " + name)
+        if halt is not None: #summary as of the halt, the other policies ran on
+            print("Halted: " + halt)
+        smr.printSummary()
+        target = open(outputName('_' + name + "-log_occupancy.txt"),'w')
+        smr.printSectorsToLog(target)
+        target.close()
+        if args.live:
+            target = open(outputName('_' + name + "-log_live.txt"),'w')
+            smr.printLiveSectorsToLog(target)
+            target.close()
@@ -0,0 +1,105 @@
+#!/usr/bin/env python
+#title           :smr_shard.py
+#description     :Simulate every device (devno) of a multi disk trace as its own smr disk
+#notes           :one process per device (or all of them in this one, -j 0), per device and whole array summaries in one csv or json table
+#python_version  :Python 2
+#precondition    :trace file available
+#==============================================================================
+
+# coding: utf-8
+
+import sys
+import argparse
+import csv
+import json
+
+from smrsim import OUTPUT_EXTS, Config
+from smrsim.shard import OUTPUTS, SIMULATORS, mergeSummaries, runInProcess, runShards, traceDevices
+from smrsim.sweep import binaryTrace
+
+#===============================================================================================
+
+# Script's arguments
+parser = argparse.ArgumentParser()
+parser.add_argument("file", help="trace file to process, text (compressed if .gz, .zst or .lz4) or binary (.npy)")
+parser.add_argument("-S","--simulator", help="simulator of every device", choices=sorted(SIMULATORS), default="multilog")
+parser.add_argument("-l","--logsize", help="size of a persistent cache log", type=int, default="10485760")
+parser.add_argument("-g","--group", help="every n group size", type=int, default="104857600")
+parser.add_argument("-b","--bandsize", help="size of band", type=int, default=10485760)
+parser.add_argument("-d","--disksize", help="size of disk", type=int, default=1099511627776)
+parser.add_argument("--pcsize", help="size of persistent cache (singlelog)", type=int, default=107374182400)
+parser.add_argument("-p","--policy", help="A,B,C,shelter", type=str, default="A")
+parser.add_argument("-n","--noclean", help="disable clean", action='store_true')
+parser.add_argument("-s","--split", help="split the output to 2 traces: w/r to persistent cache and cleanup", action='store_true')
+parser.add_argument("-c","--checkpoint", help="do checkpoint / clean on very last (oracle)", action='store_true')
+parser.add_argument("--reboot", help="do reboot after process has finished (oracle)", action='store_true')
+parser.add_argument("--live", help="track the live copy of every logged sector, live/garbage statistics", action='store_true')
+parser.add_argument("--ids", help="prefix the output lines with their IO-/CC- id (singlelog)", action='store_true')
+parser.add_argument("-j","--jobs", help="worker processes, default one per cpu, 0 for every device in this process (the trace read once)", type=int, default=None)
+parser.add_argument("-r","--result", help="result table, json if it ends with .json, csv otherwise", type=str, default=None)
+parser.add_argument("-k","--keep-output", help="write the output traces of every device", action='store_true')
+parser.add_argument("-o","--output-format", help="text, binary (columnar .cols files) or mapped (fixed-width records in a memory-mapped .rec file, see trace_convert.py)", choices=sorted(OUTPUT_EXTS), default="text")
+parser.add_argument("-z","--compress", help="compress the text outputs to .gz, .zst or .lz4 files (zstandard, lz4 modules)", choices=["gz", "zst", "lz4"], default=None)
+
+#===============================================================================================
+
+# Test mode: python smr_shard.py in/array.txt -l 5120 -g 51200 -b 5120 -d 256000 -p B -r out/array_shard.csv
+# Outputs (-k) are the ones of the simulator scripts with the device in the name, e.g. out/array_dev3_smrmultires.txt
+
+def outputName(suffix):
+    return 'out/' + str(sys.argv[1]).strip().split('/')[-1].split('.')[0] + suffix
+
+def deviceOutputs(devno, args): #output paths of a device in OUTPUTS order, None for the ones not written
+    ext = OUTPUT_EXTS[args.output_format] + ('.' + args.compress if args.compress else '')
+    prefix = '_dev' + devno
+    names = {"result": '_smrsingleres' if args.simulator == "singlelog" else '_smrmultires'}
+    if args.split:
+        names["result_cleanup"] = '_smrcleanup'
+        if args.simulator == "oracle":
+            names["result_read"] = '_read'
+    if args.reboot and args.simulator == "oracle":
+        names.update({"read_reboot": '_readback', "write_reboot": '_writeback'})
+    return [outputName(prefix + names[name] + ext) if name in names else None for name in OUTPUTS]
+
+#===============================================================================================
+
+# Main
+if __name__ == "__main__":
+    args = parser.parse_args()
+    if args.jobs is not None and args.jobs < 0:
+        parser.error("-j takes 0 or more processes")
+    if args.compress and args.output_format != "text":
+        parser.error("only text outputs are compressed")
+    config = Config.fromArgs(args)
+
+    trace = binaryTrace(args.file, 'out')
+    devices = traceDevices(trace)
+    outputs = [deviceOutputs(devno, args) for devno in devices] if args.keep_output else None
+
+    print("Running " + str(len(devices)) + " devices of " + trace)
+    if args.jobs == 0:
+        rows = runInProcess(trace, devices, args.simulator, config, outputs, args.ids)
+    else:
+        rows = runShards(trace, devices, args.simulator, config, outputs, args.ids, args.jobs)
+    total = dict(mergeSummaries([row for row in rows if not row["error"]]), devno="all")
+    total["seconds"] = (sum if args.jobs == 0 else max)(row["seconds"] for row in rows) if rows else 0 #in this process the devices run one after another
+
+    columns = ["devno"] + sorted(set(key for row in rows + [total] for key in row) - set(["devno", "seconds", "error"])) + ["seconds", "error"]
+    result_name = args.result or outputName('_shard.csv')
+    with open(result_name, 'w') as result:
+        if result_name.endswith('.json'):
+            json.dump({"devices": rows, "total": total}, result, indent=1, sort_keys=True)
+        else:
+            writer = csv.DictWriter(result, columns)
+            writer.writeheader()
+            writer.writerows(rows + [total])
+
+    print("------------Result Summary------------")
+    for key in sorted(total):
+        if key not in ("devno", "seconds"):
+            print(key + ": " + str(total[key]))
+    print("--------------------------------------")
+    failed = [row for row in rows if row["error"]]
+    print("Wrote " + result_name + ", " + str(len(failed)) + " failed devices")
+    for row in failed:
+        print("device " + str(row["devno"]) + ": " + row["error"])
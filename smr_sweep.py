@@ -0,0 +1,80 @@
+#!/usr/bin/env python
+#title           :smr_sweep.py
+#description     :Sweep multi log configurations (log, group, band and disk size, policy) over one trace
+#notes           :one process per configuration, results of printSummary collected in one csv or json table
+#python_version  :Python 2 
+#precondition    :trace file available
+#==============================================================================
+
+# coding: utf-8
+
+import sys
+import argparse
+import csv
+import json
+
+from smrsim import Config
+from smrsim.sweep import SWEEP_ORDER, binaryTrace, gridConfigs, runSweep
+
+#===============================================================================================
+
+# Script's arguments, every size option takes a comma separated list of values
+parser = argparse.ArgumentParser()
+parser.add_argument("file", help="trace file to process, text (compressed if .gz, .zst or .lz4) or binary (.npy)")
+parser.add_argument("-l","--logsize", help="sizes of a persistent cache log", type=str, default="10485760")
+parser.add_argument("-g","--group", help="every n group sizes", type=str, default="104857600")
+parser.add_argument("-b","--bandsize", help="sizes of band", type=str, default="10485760")
+parser.add_argument("-d","--disksize", help="sizes of disk", type=str, default="1099511627776")
+parser.add_argument("-p","--policy", help="policies among A,B,C,shelter", type=str, default="A")
+parser.add_argument("-n","--noclean", help="also run every point with clean disabled", action='store_true')
+parser.add_argument("-j","--jobs", help="worker processes, default one per cpu", type=int, default=None)
+parser.add_argument("-r","--result", help="result table, json if it ends with .json, csv otherwise", type=str, default=None)
+parser.add_argument("-k","--keep-output", help="write the output trace of every configuration", action='store_true')
+
+#===============================================================================================
+
+# Test mode: python smr_sweep.py in/trace2.txt -l 5120,10240 -g 51200 -b 5120,10240 -d 256000 -p A,B -r out/trace2_sweep.csv
+
+def outputName(suffix):
+    return 'out/' + str(sys.argv[1]).strip().split('/')[-1].split('.')[0] + suffix
+
+def sizes(values):
+    return [int(value) for value in values.split(",")]
+
+#===============================================================================================
+
+# Main
+if __name__ == "__main__":
+    args = parser.parse_args()
+
+    grid = {
+        "logsize": sizes(args.logsize),
+        "group": sizes(args.group),
+        "bandsize": sizes(args.bandsize),
+        "disksize": sizes(args.disksize),
+        "policy": [policy.strip() for policy in args.policy.split(",")],
+        "noclean": [False, True] if args.noclean else [False],
+    }
+    configs = gridConfigs(Config(), grid)
+    trace = binaryTrace(args.file, 'out')
+    outputs = None
+    if args.keep_output:
+        outputs = [outputName('_sweep%d_smrmultires.txt' % idx) for idx in range(len(configs))]
+
+    print("Running " + str(len(configs)) + " configurations on " + trace)
+    rows = runSweep(trace, configs, args.jobs, outputs)
+
+    columns = ["job"] + SWEEP_ORDER + ["clean_count", "writes_to_pcache", "reads_to_disk", "sectors_to_pcache",
+               "total_dirty_bands", "avg_dirty_bands_per_clean", "seconds", "error"]
+    result_name = args.result or outputName('_sweep.csv')
+    with open(result_name, 'w') as result:
+        if result_name.endswith('.json'):
+            json.dump(rows, result, indent=1, sort_keys=True)
+        else:
+            writer = csv.DictWriter(result, columns)
+            writer.writeheader()
+            writer.writerows(rows)
+    failed = [row for row in rows if row["error"]]
+    print("Wrote " + result_name + ", " + str(len(failed)) + " failed configurations")
+    for row in failed:
+        print("job " + str(row["job"]) + ": " + row["error"])
@@ -0,0 +1,24 @@
+# coding: utf-8
+# SMR disk simulators, importable so several configurations can run in one process:
+#
+#   from smrsim import Config, MultiLogSMR, readTrace
+#   sim = MultiLogSMR(Config(policy="B"), open("out/res.txt", "w"))
+#   sim.run(readTrace(open("in/trace.txt"))) # or a binary trace, see trace_convert.py
+#   sim.printSummary()
+
+from smrsim.config import SECTOR_SIZE, Config
+from smrsim.errors import HaltException
+from smrsim.compress import openText
+from smrsim.output import OUTPUT_EXTS, MappedWriter, NullWriter, TraceWriter, closeOutputs, openOutput, readOutputBlocks, readRecords, writeTextOutput, writeTextRecords
+from smrsim.trace import READ, WRITE, TraceCursor, chunkEvents, readTrace, readTraceChunks, writeBinaryTrace, writeTextTrace
+from smrsim.allocator import PLACEMENTS, LogAllocator
+from smrsim.multilog import MultiLogSMR
+from smrsim.oracle import OracleSMR
+from smrsim.vector import VectorMultiLogSMR, compareEngines
+from smrsim.singlelog import SingleLogSMR
+from smrsim.fanout import runTogether
+from smrsim.sweep import gridConfigs, runSweep
+from smrsim.shard import ShardedSMR, mergeSummaries, runInProcess, runShards
+from smrsim.generator import TraceGenerator, writeGeneratedTrace
+from smrsim.instrument import Instruments
+from smrsim.snapshot import loadSnapshot, restoreSnapshot, runSnapshots, saveSnapshot
@@ -0,0 +1,308 @@
+/*
+ * _accel.c - optional compiled kernels of the simulators, built with: python build_accel.py
+ *
+ * Every kernel does what a python path of smrsim does, to the byte, and smrsim.accel falls back to
+ * that path when this module is not built. Arrays come in through the buffer protocol (numpy arrays,
+ * contiguous, int64 unless said otherwise), no numpy C API:
+ *   parseLines(data) - "time devno blkno blkcount flag" lines into columns, as trace.parseChunk
+ *   logWrites(...) - logged writes into the logs of the vector engine up to the first full log
+ *   formatRows(...) - output lines of requests, as TraceWriter.write
+ */
+
+#define PY_SSIZE_T_CLEAN
+#include <Python.h>
+#include <stdint.h>
+#include <stdio.h>
+#include <string.h>
+
+#if PY_MAJOR_VERSION >= 3
+#define BYTES_FROM_SIZE PyBytes_FromStringAndSize
+#define BYTES_AS_STRING PyBytes_AS_STRING
+#define BYTES_RESIZE _PyBytes_Resize
+#else
+#define BYTES_FROM_SIZE PyString_FromStringAndSize
+#define BYTES_AS_STRING PyString_AS_STRING
+#define BYTES_RESIZE _PyString_Resize
+#endif
+
+static int isSpace(char c) /* the whitespace of str.split() */
+{
+    return c == ' ' || c == '\t' || c == '\r' || c == '\v' || c == '\f';
+}
+
+static int parseInt(const char *p, Py_ssize_t len, int64_t *value) /* int(token), 0 when python would differ */
+{
+    Py_ssize_t i = 0;
+    int negative = 0;
+    uint64_t v = 0;
+    if (len > 0 && (p[0] == '+' || p[0] == '-')) {
+        negative = p[0] == '-';
+        i = 1;
+    }
+    if (i == len || len - i > 18) /* no digits, or maybe past int64: the python path decides */
+        return 0;
+    for (; i < len; i++) {
+        if (p[i] < '0' || p[i] > '9')
+            return 0;
+        v = v * 10 + (uint64_t)(p[i] - '0');
+    }
+    *value = negative ? -(int64_t)v : (int64_t)v;
+    return 1;
+}
+
+/* ------------------------------------------------------------------------------------------------ */
+
+typedef struct {
+    const char *start[5];
+    Py_ssize_t len[5];
+} Fields;
+
+static int splitLine(const char *p, const char *end, Fields *fields) /* first five tokens of a line, 0 if fewer */
+{
+    int k = 0;
+    while (k < 5) {
+        while (p < end && isSpace(*p))
+            p++;
+        if (p == end)
+            return 0;
+        fields->start[k] = p;
+        while (p < end && !isSpace(*p))
+            p++;
+        fields->len[k] = p - fields->start[k];
+        k++;
+    }
+    return 1;
+}
+
+static const char *lineEnd(const char *p, const char *end)
+{
+    const char *nl = memchr(p, '\n', end - p);
+    return nl ? nl : end;
+}
+
+static PyObject *parseLines(PyObject *self, PyObject *args)
+{
+    Py_buffer data;
+    const char *p, *end, *stop;
+    Py_ssize_t count = 0, time_width = 1, devno_width = 1, i;
+    Fields fields;
+    PyObject *times = NULL, *devnos = NULL, *blknos = NULL, *blkcounts = NULL, *flags = NULL, *result = NULL;
+
+    if (!PyArg_ParseTuple(args, "s*", &data))
+        return NULL;
+    p = (const char *)data.buf;
+    end = p + data.len;
+
+    /* first pass: lines and widths, any line python would read another way is an error */
+    while (p < end) {
+        stop = lineEnd(p, end);
+        if (!splitLine(p, stop, &fields)) {
+            PyErr_SetString(PyExc_ValueError, "trace line with less than five fields");
+            goto done;
+        }
+        if (fields.len[0] > time_width)
+            time_width = fields.len[0];
+        if (fields.len[1] > devno_width)
+            devno_width = fields.len[1];
+        count++;
+        p = stop + 1;
+    }
+
+    times = BYTES_FROM_SIZE(NULL, count * time_width);
+    devnos = BYTES_FROM_SIZE(NULL, count * devno_width);
+    blknos = BYTES_FROM_SIZE(NULL, count * 8);
+    blkcounts = BYTES_FROM_SIZE(NULL, count * 4);
+    flags = BYTES_FROM_SIZE(NULL, count);
+    if (!times || !devnos || !blknos || !blkcounts || !flags)
+        goto done;
+    memset(BYTES_AS_STRING(times), 0, count * time_width);
+    memset(BYTES_AS_STRING(devnos), 0, count * devno_width);
+
+    p = (const char *)data.buf;
+    for (i = 0; i < count; i++) {
+        int64_t blkno, blkcount;
+        int32_t blkcount32;
+        stop = lineEnd(p, end);
+        splitLine(p, stop, &fields);
+        if (!parseInt(fields.start[2], fields.len[2], &blkno) || !parseInt(fields.start[3], fields.len[3], &blkcount)) {
+            PyErr_SetString(PyExc_ValueError, "trace line with a blkno or blkcount the kernel does not read");
+            goto done;
+        }
+        if (blkcount < INT32_MIN || blkcount > INT32_MAX) {
+            PyErr_SetString(PyExc_ValueError, "trace line with a blkcount wider than the int32 field");
+            goto done;
+        }
+        blkcount32 = (int32_t)blkcount;
+        memcpy(BYTES_AS_STRING(times) + i * time_width, fields.start[0], fields.len[0]);
+        memcpy(BYTES_AS_STRING(devnos) + i * devno_width, fields.start[1], fields.len[1]);
+        memcpy(BYTES_AS_STRING(blknos) + i * 8, &blkno, 8);
+        memcpy(BYTES_AS_STRING(blkcounts) + i * 4, &blkcount32, 4);
+        BYTES_AS_STRING(flags)[i] = fields.len[4] == 1 && fields.start[4][0] == '1'; /* anything but 1 is a write */
+        p = stop + 1;
+    }
+    result = Py_BuildValue("nnOnOOOO", count, time_width, times, devno_width, devnos, blknos, blkcounts, flags);
+
+done:
+    Py_XDECREF(times);
+    Py_XDECREF(devnos);
+    Py_XDECREF(blknos);
+    Py_XDECREF(blkcounts);
+    Py_XDECREF(flags);
+    PyBuffer_Release(&data);
+    return result;
+}
+
+/* ------------------------------------------------------------------------------------------------ */
+
+#define LOG_BUFFERS 12
+
+static PyObject *logWrites(PyObject *self, PyObject *args)
+{
+    /* writes start.. of a chunk: positions, logs, blknos, blkcounts; disk: output blkno of every request;
+     * per log: fill, hits, extents, log_slot; arena: blkno, blkcount, slot, with room for every write.
+     * Returns the first write without room in its log (not logged), or the write count */
+    Py_buffer buffers[LOG_BUFFERS];
+    Py_ssize_t start, used, i, writes, nlogs, k;
+    long long pcache_size, diskset_size, band_size;
+    int64_t *positions, *logs, *blknos, *blkcounts, *disk, *fill, *hits, *extents, *log_slot, *arena_blkno, *arena_blkcount, *arena_slot;
+    PyObject *result = NULL;
+
+    memset(buffers, 0, sizeof(buffers));
+    if (!PyArg_ParseTuple(args, "nw*w*w*w*w*w*w*w*w*w*w*w*nLLL", &start,
+                          &buffers[0], &buffers[1], &buffers[2], &buffers[3], &buffers[4], &buffers[5], &buffers[6],
+                          &buffers[7], &buffers[8], &buffers[9], &buffers[10], &buffers[11],
+                          &used, &pcache_size, &diskset_size, &band_size))
+        return NULL;
+    for (k = 0; k < LOG_BUFFERS; k++) {
+        if (buffers[k].len % 8 != 0) {
+            PyErr_SetString(PyExc_TypeError, "logWrites takes int64 arrays");
+            goto done;
+        }
+    }
+    positions = buffers[0].buf;
+    logs = buffers[1].buf;
+    blknos = buffers[2].buf;
+    blkcounts = buffers[3].buf;
+    disk = buffers[4].buf;
+    fill = buffers[5].buf;
+    hits = buffers[6].buf;
+    extents = buffers[7].buf;
+    log_slot = buffers[8].buf;
+    arena_blkno = buffers[9].buf;
+    arena_blkcount = buffers[10].buf;
+    arena_slot = buffers[11].buf;
+    writes = buffers[0].len / 8;
+    nlogs = buffers[5].len / 8;
+    if (buffers[1].len / 8 < writes || buffers[2].len / 8 < writes || buffers[3].len / 8 < writes ||
+        buffers[9].len / 8 < used + writes - start || buffers[10].len / 8 < used + writes - start || buffers[11].len / 8 < used + writes - start ||
+        band_size <= 0) {
+        PyErr_SetString(PyExc_ValueError, "logWrites: arrays too short");
+        goto done;
+    }
+
+    for (i = start; i < writes; i++) {
+        int64_t n = logs[i], blkno = blknos[i], blkcount = blkcounts[i], offset;
+        Py_ssize_t position = (Py_ssize_t)positions[i];
+        if (n < 0 || n >= nlogs || position < 0 || position >= (Py_ssize_t)(buffers[4].len / 8)) {
+            PyErr_SetString(PyExc_IndexError, "logWrites: log or request out of range");
+            goto done;
+        }
+        if (fill[n] + blkcount > pcache_size)
+            break;
+        disk[position] = n * diskset_size + fill[n]; /* write target */
+        arena_blkno[used] = blkno;
+        arena_blkcount[used] = blkcount;
+        arena_slot[used] = log_slot[n];
+        used++;
+        offset = blkno % band_size; /* python modulo, blknos are not negative in practice */
+        if (offset < 0)
+            offset += band_size;
+        fill[n] += blkcount;
+        hits[n] += (blkcount + offset + band_size - 1) / band_size; /* bands of the extent, as markDirtyBands */
+        extents[n] += 1;
+    }
+    result = PyLong_FromSsize_t(i);
+
+done:
+    for (k = 0; k < LOG_BUFFERS; k++) {
+        if (buffers[k].obj != NULL)
+            PyBuffer_Release(&buffers[k]);
+    }
+    return result;
+}
+
+/* ------------------------------------------------------------------------------------------------ */
+
+static PyObject *formatRows(PyObject *self, PyObject *args)
+{
+    /* "time devno blkno blkcount flag\n" lines: times and devnos fixed width (NUL padded) byte strings,
+     * blknos and blkcounts int64, flags uint8 */
+    Py_buffer times, devnos, blknos, blkcounts, flags;
+    Py_ssize_t time_width, devno_width, count, i, size = 0, capacity;
+    PyObject *out = NULL;
+    char *o;
+
+    if (!PyArg_ParseTuple(args, "s*ns*ns*s*s*", &times, &time_width, &devnos, &devno_width, &blknos, &blkcounts, &flags))
+        return NULL;
+    count = flags.len;
+    if (time_width <= 0 || devno_width <= 0 || times.len < count * time_width || devnos.len < count * devno_width ||
+        blknos.len < count * 8 || blkcounts.len < count * 8) {
+        PyErr_SetString(PyExc_ValueError, "formatRows: columns of different lengths");
+        goto done;
+    }
+    capacity = count * (time_width + devno_width + 50); /* " %lld %lld %d\n" takes 48 at most */
+    out = BYTES_FROM_SIZE(NULL, capacity);
+    if (!out)
+        goto done;
+    o = BYTES_AS_STRING(out);
+    for (i = 0; i < count; i++) {
+        const char *t = (const char *)times.buf + i * time_width, *d = (const char *)devnos.buf + i * devno_width;
+        Py_ssize_t tl = 0, dl = 0;
+        int64_t blkno, blkcount;
+        while (tl < time_width && t[tl])
+            tl++;
+        while (dl < devno_width && d[dl])
+            dl++;
+        memcpy(&blkno, (const char *)blknos.buf + i * 8, 8);
+        memcpy(&blkcount, (const char *)blkcounts.buf + i * 8, 8);
+        memcpy(o + size, t, tl);
+        size += tl;
+        o[size++] = ' ';
+        memcpy(o + size, d, dl);
+        size += dl;
+        size += sprintf(o + size, " %lld %lld %d\n", (long long)blkno, (long long)blkcount, (int)((const unsigned char *)flags.buf)[i]);
+    }
+    if (BYTES_RESIZE(&out, size) < 0)
+        out = NULL;
+
+done:
+    PyBuffer_Release(&times);
+    PyBuffer_Release(&devnos);
+    PyBuffer_Release(&blknos);
+    PyBuffer_Release(&blkcounts);
+    PyBuffer_Release(&flags);
+    return out;
+}
+
+/* ------------------------------------------------------------------------------------------------ */
+
+static PyMethodDef methods[] = {
+    {"parseLines", parseLines, METH_VARARGS, "columns of a block of trace lines"},
+    {"logWrites", logWrites, METH_VARARGS, "log writes up to the first full log"},
+    {"formatRows", formatRows, METH_VARARGS, "output lines of requests"},
+    {NULL, NULL, 0, NULL}
+};
+
+#if PY_MAJOR_VERSION >= 3
+static struct PyModuleDef module = {PyModuleDef_HEAD_INIT, "_accel", NULL, -1, methods};
+
+PyMODINIT_FUNC PyInit__accel(void)
+{
+    return PyModule_Create(&module);
+}
+#else
+PyMODINIT_FUNC init_accel(void)
+{
+    Py_InitModule("_accel", methods);
+}
+#endif
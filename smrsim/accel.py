@@ -0,0 +1,17 @@
+#!/usr/bin/env python
+#title           :accel.py
+#description     :Optional compiled kernels of the simulators (smrsim/_accel.c), None when not built
+#==============================================================================
+
+# coding: utf-8
+
+import os
+
+# Built with python build_accel.py. Every user of the kernels keeps its python path for when they are
+# missing and gets the same results from both; SMRSIM_NO_ACCEL=1 turns them off (differential runs)
+kernels = None
+if not os.environ.get("SMRSIM_NO_ACCEL"):
+    try:
+        from smrsim import _accel as kernels
+    except ImportError:
+        kernels = None
@@ -0,0 +1,93 @@
+#!/usr/bin/env python
+#title           :allocator.py
+#description     :Free logs of a multi log disk, the destinations of log swaps
+#==============================================================================
+
+# coding: utf-8
+
+from bitarray import bitarray
+
+from smrsim.errors import HaltException
+
+# Placements of a swapped log:
+#   forward - first free log from the last destination on, starting at 80% of the disk and wrapping around
+#             to the first log past the end (the original placement, which stopped at the end of the disk)
+#   nearest - free log closest to the swapped one, the shortest move
+#   reserved - like forward inside the reserved region (the last 20% of the disk), anywhere once it is full
+PLACEMENTS = ["forward", "nearest", "reserved"]
+RESERVED_SHARE = 0.8 #first log of the reserved region, as a share of the logs
+
+class LogAllocator(object):
+    # Logs that may be free as a bitmap (and its mirror, to search backwards), set bits are candidates.
+    # Emptied logs are released, written logs are not reported: a candidate is checked when found and
+    # dropped if it holds data, so writes cost nothing here and each stale candidate is dropped once.
+    # A search is a bitmap scan in C, the python part is amortized O(1) per swap
+    def __init__(self, pcache, placement = "forward"):
+        if placement not in PLACEMENTS:
+            raise ValueError("unknown log placement: " + str(placement))
+        self.pcache = pcache #logs of the simulator (or their extent counts), a log is free when empty
+        self.placement = placement
+        self.nlogs = len(pcache)
+        self.reserved = int(RESERVED_SHARE * self.nlogs)
+        self.free = bitarray(self.nlogs)
+        self.free_mirror = bitarray(self.nlogs) #free_mirror[nlogs - 1 - n] = free[n]
+        self.reset()
+
+    def reset(self): #every empty log is a candidate
+        self.free.setall(True)
+        self.free_mirror.setall(True)
+
+    def release(self, n): #log n was emptied
+        self.free[n] = True
+        self.free_mirror[self.nlogs - 1 - n] = True
+
+    def drop(self, n): #candidate n holds data
+        self.free[n] = False
+        self.free_mirror[self.nlogs - 1 - n] = False
+
+    def firstFree(self, start, stop): #first free log in [start, stop), -1 if none
+        while start < stop:
+            try:
+                n = self.free.index(True, start, stop)
+            except ValueError:
+                return -1
+            if not self.pcache[n]:
+                return n
+            self.drop(n)
+            start = n + 1
+        return -1
+
+    def lastFree(self, start, stop): #last free log in [start, stop), -1 if none
+        while start < stop:
+            try:
+                n = self.nlogs - 1 - self.free_mirror.index(True, self.nlogs - stop, self.nlogs - start)
+            except ValueError:
+                return -1
+            if not self.pcache[n]:
+                return n
+            self.drop(n)
+            stop = n
+        return -1
+
+    def take(self, src, cursor): #destination of a swap of log src, cursor: the last destination
+        if self.placement == "nearest":
+            after = self.firstFree(src + 1, self.nlogs)
+            before = self.lastFree(0, src)
+            if before < 0 or (after >= 0 and after - src <= src - before):
+                n = after
+            else:
+                n = before
+        elif self.placement == "reserved": #the region from the cursor on, the rest of the region, then anywhere
+            start = max(cursor, self.reserved)
+            n = self.firstFree(start, self.nlogs)
+            if n < 0:
+                n = self.firstFree(self.reserved, start)
+            if n < 0:
+                n = self.firstFree(0, self.reserved)
+        else: #forward, from the cursor on then from the first log
+            n = self.firstFree(cursor, self.nlogs)
+            if n < 0:
+                n = self.firstFree(0, cursor)
+        if n < 0:
+            raise HaltException("no free log left to swap log %d to! script terminated" % src)
+        return n
@@ -0,0 +1,214 @@
+#!/usr/bin/env python
+#title           :bench.py
+#description     :Throughput benchmark of the simulators over generated traces
+#==============================================================================
+
+# coding: utf-8
+
+import multiprocessing
+import os
+import platform
+import resource
+import subprocess
+import sys
+import time
+import traceback
+from itertools import islice
+
+import numpy as np
+
+from smrsim.config import SECTOR_SIZE, Config
+from smrsim.generator import TraceGenerator, writeGeneratedTrace
+from smrsim.multilog import MultiLogSMR
+from smrsim.oracle import OracleSMR
+from smrsim.output import closeOutputs, openOutput
+from smrsim.singlelog import SingleLogSMR
+from smrsim.trace import CHUNK_LINES, readTrace
+from smrsim.vector import VectorMultiLogSMR
+
+# A case is one simulator configuration over one generated trace, run in a fresh worker process so
+# that its peak RSS is its own. Timing every output request slows a case down by ~20%, so events/s and
+# peak RSS come from a plain run and the phases from a second, profiled run. Phases are exclusive wall
+# times adding up to the profiled run time:
+#   parse - reading the trace, simulate - the simulator itself, clean - cleans, log swaps and checkpoint,
+#   reboot - the oracle reboot, output - formatting and writing the output traces
+GEOMETRIES = {
+    "small": {"logsize": 262144, "group": 1048576, "bandsize": 131072, "disksize": 1073741824},
+    "default": {"logsize": 10485760, "group": 104857600, "bandsize": 10485760, "disksize": 1099511627776},
+}
+SIMULATORS = ["multilog", "vector", "oracle", "singlelog"] #vector: VectorMultiLogSMR, the numpy engine of multilog
+POLICIES = ["A", "B", "C", "shelter"]
+PHASES = ["parse", "simulate", "clean", "reboot", "output"]
+NOCLEAN_DISK_FACTOR = 32 #log swaps need empty logs, noclean cases get a larger disk past the traced sectors
+
+class PhaseTimer(object):
+    # Timed calls add their time minus the time of the timed calls they make themselves,
+    # whatever is left of the case time is simulate. A timed call costs about a microsecond
+    def __init__(self):
+        self.seconds = dict((phase, 0.0) for phase in PHASES)
+        self.nested = 0.0 #time of the timed calls made by the running one
+
+    def wrap(self, obj, names, phase): #time the given methods of obj as phase
+        for name in names:
+            method = getattr(obj, name, None)
+            if method is not None:
+                setattr(obj, name, self.timed(method, phase))
+
+    def timed(self, method, phase):
+        seconds = self.seconds
+        clock = time.time
+        def call(*args):
+            outer = self.nested
+            self.nested = 0.0
+            start = clock()
+            try:
+                return method(*args)
+            finally:
+                spent = clock() - start
+                seconds[phase] += spent - self.nested
+                self.nested = outer + spent
+        return call
+
+    def finish(self, total): #phase seconds of a case that took total seconds
+        self.seconds["simulate"] = total - sum(seconds for phase, seconds in self.seconds.items() if phase != "simulate")
+        return dict((phase, round(seconds, 3)) for phase, seconds in self.seconds.items())
+
+def benchConfig(case): #Config of a case, see benchCases
+    geometry = GEOMETRIES[case["geometry"]]
+    if case["simulator"] == "singlelog": #one cache as large as all the logs of the geometry
+        return Config(pcsize=(geometry["disksize"] // geometry["group"]) * geometry["logsize"], bandsize=geometry["bandsize"])
+    config = Config(policy=case["policy"], noclean=case["noclean"], **geometry)
+    if case["noclean"]:
+        config = config.replace(disksize=geometry["disksize"] * NOCLEAN_DISK_FACTOR)
+    if case["simulator"] == "oracle":
+        config = config.replace(checkpoint=True, reboot=True)
+    return config
+
+def traceSectors(geometry): #logical sectors of a multi log geometry, the room left by the logs
+    return (geometry["disksize"] // geometry["group"]) * (geometry["group"] - geometry["logsize"]) // SECTOR_SIZE
+
+def benchCases(sizes, geometries, simulators = SIMULATORS, policies = POLICIES):
+    cases = []
+    for events in sizes:
+        for geometry in geometries:
+            base = {"events": events, "geometry": geometry, "policy": None, "noclean": False}
+            for simulator in simulators:
+                if simulator == "singlelog":
+                    cases.append(dict(base, simulator=simulator))
+                    continue
+                for policy in policies:
+                    cases.append(dict(base, simulator=simulator, policy=policy))
+                    if simulator == "multilog" or simulator == "vector":
+                        cases.append(dict(base, simulator=simulator, policy=policy, noclean=True))
+    return cases
+
+def benchTrace(workdir, events, geometry, binary = False, pattern = "zipf", read_ratio = 0.5, seed = 1):
+    # generated trace of a size and geometry, kept in workdir for the next runs
+    path = os.path.join(workdir, "bench_%s_%s_%d_%s%s" % (geometry, pattern, events, seed, ".npy" if binary else ".txt"))
+    if not os.path.exists(path):
+        generator = TraceGenerator(traceSectors(GEOMETRIES[geometry]), pattern=pattern, seed=seed)
+        writeGeneratedTrace(path, generator.mixChunks(events, read_ratio), events)
+    return path
+
+def caseName(case):
+    name = case["simulator"] + ("-" + case["policy"] if case["policy"] else "") + ("-noclean" if case["noclean"] else "")
+    return "%s/%s/%d" % (name, case["geometry"], case["events"])
+
+def runCase(job): #worker: simulate one case, returns its result row, with phases if profiled
+    case, trace, workdir, ext, profiled = job
+    sys.stdout = open(os.devnull, "w") #the simulators print progress, the worker is dropped after the case
+    row = dict(case, name=caseName(case), trace=os.path.basename(trace))
+    row["start_rss_mb"] = round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0, 1)
+    timer = PhaseTimer()
+    paths = []
+    start = time.time()
+    try:
+        def output(suffix, ids = False):
+            path = os.path.join(workdir, "bench_out_" + suffix + ext)
+            paths.append(path)
+            out = openOutput(path, ids)
+            if profiled:
+                timer.wrap(out, ["write", "writeId", "writeBands", "writeExtents", "prepareRows", "writePrepared", "writeArrays", "flush", "close"], "output")
+            return out
+
+        config = benchConfig(case)
+        if case["simulator"] == "multilog":
+            smr = MultiLogSMR(config, output("res"))
+            outputs = [smr.result]
+        elif case["simulator"] == "vector":
+            smr = VectorMultiLogSMR(config, output("res"))
+            outputs = [smr.result]
+        elif case["simulator"] == "oracle":
+            smr = OracleSMR(config, output("res", ids=True), None, None, output("readback"), output("writeback"))
+            outputs = [smr.result, smr.read_reboot, smr.write_reboot]
+        else:
+            smr = SingleLogSMR(config, output("res"))
+            outputs = [smr.result]
+        events = readTrace(trace)
+        nextChunk = lambda: list(islice(events, CHUNK_LINES))
+        if profiled:
+            timer.wrap(smr, ["cleanPCache", "logSwap"], "clean")
+            timer.wrap(smr, ["reboot"], "reboot")
+            nextChunk = timer.timed(nextChunk, "parse")
+        try:
+            chunk = nextChunk()
+            while chunk:
+                smr.feed(chunk)
+                chunk = nextChunk()
+            smr.finish()
+        finally:
+            closeOutputs(outputs)
+        row["summary"] = smr.summary()
+        row["error"] = None
+    except Exception:
+        row["error"] = traceback.format_exc().strip().split("\n")[-1]
+    seconds = time.time() - start
+    for path in paths:
+        if os.path.exists(path):
+            os.remove(path)
+
+    row["seconds"] = round(seconds, 3)
+    row["events_per_sec"] = int(case["events"] / seconds) if seconds > 0 else None
+    row["peak_rss_mb"] = round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0, 1)
+    if profiled:
+        row["phases"] = timer.finish(seconds)
+    return row
+
+def runBench(cases, traces, workdir, ext = ".txt", phases = True): #rows in case order, traces: trace path per case
+    # one run at a time, each in a new process (maxtasksperchild=1), the profiled run right after the plain one
+    jobs = []
+    for case, trace in zip(cases, traces):
+        jobs.append((case, trace, workdir, ext, False))
+        if phases:
+            jobs.append((case, trace, workdir, ext, True))
+    pool = multiprocessing.Pool(1, maxtasksperchild=1)
+    try:
+        runs = pool.imap(runCase, jobs)
+        for row in runs:
+            if phases:
+                profiled = next(runs)
+                row["phases"] = profiled["phases"]
+                row["profiled_seconds"] = profiled["seconds"]
+            yield row
+    finally:
+        pool.close()
+        pool.join()
+
+def benchInfo(): #what the results were measured with
+    try:
+        version = subprocess.check_output(["git", "describe", "--always", "--dirty"], cwd=os.path.dirname(os.path.abspath(__file__)),
+                                          stderr=open(os.devnull, "w")).strip().decode()
+    except (OSError, subprocess.CalledProcessError):
+        version = None
+    return {"version": version, "python": platform.python_version(), "numpy": np.__version__,
+            "machine": platform.machine(), "date": time.strftime("%Y-%m-%d %H:%M:%S")}
+
+def compareRows(old, new): #(name, old events/s, new events/s, speedup) of the cases found in both runs
+    before = dict((row["name"], row) for row in old if not row["error"])
+    pairs = []
+    for row in new:
+        if row["error"] or row["name"] not in before:
+            continue
+        old_rate = before[row["name"]]["events_per_sec"]
+        pairs.append((row["name"], old_rate, row["events_per_sec"], float(row["events_per_sec"]) / old_rate if old_rate else None))
+    return pairs
@@ -0,0 +1,214 @@
+#!/usr/bin/env python
+#title           :compress.py
+#description     :Compressed text traces and outputs, gzip, zstd or lz4 streams by file extension
+#==============================================================================
+
+# coding: utf-8
+
+import atexit
+import gzip
+import io
+import threading
+import weakref
+
+try:
+    import Queue as queue
+except ImportError:
+    import queue
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+try:
+    import lz4.frame as lz4frame
+except ImportError:
+    lz4frame = None
+
+# A text trace or output whose path ends with .gz, .zst or .lz4 is a compressed stream, gzip from the
+# standard library, zstd and lz4 from the optional zstandard and lz4 modules. A background thread reads
+# and decompresses the trace STREAM_BLOCK bytes at a time, and compresses and writes an output as much,
+# with up to QUEUE_BLOCKS blocks waiting in between: zlib, zstandard and lz4 let go of the GIL while
+# they work, so the streams overlap the simulation. Binary traces and outputs are memory-mapped and are
+# never compressed. A compressed trace has no seek, a resumed run reads it again up to its position, and
+# a compressed output cannot be cut back to a snapshot
+COMPRESSIONS = {".gz": "gzip", ".zst": "zstd", ".lz4": "lz4"}
+BINARY_EXTS = (".npy", ".cols", ".rec")
+STREAM_BLOCK = 1 << 20
+QUEUE_BLOCKS = 8
+GZIP_LEVEL = 6
+READERS = weakref.WeakSet() #open StreamReaders, stopped at exit
+
+def compressionExt(path): #.gz, .zst or .lz4 ending path, None when it is not compressed
+    for ext in COMPRESSIONS:
+        if str(path).endswith(ext):
+            return ext
+    return None
+
+def isCompressed(path):
+    return compressionExt(path) is not None
+
+def openStream(path, mode): #compressed file object of path, mode "rb" or "wb"
+    name = COMPRESSIONS[compressionExt(path)]
+    if name == "gzip":
+        return gzip.open(path, mode, GZIP_LEVEL)
+    if name == "zstd":
+        if zstandard is None:
+            raise ValueError("%s: zstd streams need the zstandard module" % path)
+        if mode == "rb":
+            return zstandard.ZstdDecompressor().stream_reader(open(path, "rb"))
+        return zstandard.ZstdCompressor().stream_writer(open(path, "wb"))
+    if lz4frame is None:
+        raise ValueError("%s: lz4 streams need the lz4 module" % path)
+    return lz4frame.open(path, mode)
+
+def openText(path, mode = "r", buffering = -1): #text trace or output file, through a compressed stream by its extension
+    ext = compressionExt(path)
+    if ext is None:
+        return open(path, mode, buffering)
+    if str(path)[:-len(ext)].endswith(BINARY_EXTS):
+        raise ValueError("%s: binary traces and outputs are memory-mapped, they cannot be compressed" % path)
+    return StreamReader(path) if mode.startswith("r") else StreamWriter(path)
+
+class StreamReader(object):
+    # lines of a compressed text file, decompressed ahead by a background thread
+    def __init__(self, path):
+        self.name = path
+        self.stream = openStream(path, "rb")
+        self.blocks = queue.Queue(QUEUE_BLOCKS)
+        self.stopped = False
+        self.thread = threading.Thread(target=self.readBlocks)
+        self.thread.daemon = True
+        self.thread.start()
+        self.lines = self.readLines()
+        READERS.add(self)
+
+    def readBlocks(self): #thread, decompressed blocks to the queue, an empty one at the end
+        try:
+            block = True
+            while block and not self.stopped:
+                block = self.stream.read(STREAM_BLOCK)
+                self.put(block)
+        except Exception as error: #raised by the reading side
+            self.put(error)
+
+    def put(self, item): #waits for room in the queue until the reader is closed
+        while not self.stopped:
+            try:
+                self.blocks.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                pass
+
+    def readLines(self):
+        rest = b""
+        while True:
+            block = self.blocks.get()
+            if isinstance(block, Exception):
+                raise block
+            if not block:
+                if rest:
+                    yield rest
+                return
+            data = rest + block
+            cut = data.rfind(b"\n") + 1
+            rest = data[cut:]
+            for line in io.BytesIO(data[:cut]):
+                yield line
+
+    def __iter__(self):
+        return self.lines
+
+    def next(self):
+        return next(self.lines)
+
+    __next__ = next
+
+    def skip(self, size): #drop the next lines, size bytes in all
+        while size > 0:
+            line = next(self.lines, None)
+            if line is None:
+                raise ValueError("%s is shorter than the position to skip to" % self.name)
+            size -= len(line)
+
+    def close(self):
+        self.stopped = True
+        self.thread.join()
+        self.stream.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+def closeReaders(): #a reader thread still going at exit would die in the middle of the interpreter shutdown
+    for reader in list(READERS):
+        if not reader.stopped:
+            reader.close()
+
+atexit.register(closeReaders)
+
+class StreamWriter(object):
+    # compressed text file, written STREAM_BLOCK bytes at a time by a background thread
+    def __init__(self, path):
+        self.name = path
+        self.stream = openStream(path, "wb")
+        self.pending = []
+        self.size = 0
+        self.error = None
+        self.blocks = queue.Queue(QUEUE_BLOCKS)
+        self.thread = threading.Thread(target=self.writeBlocks)
+        self.thread.daemon = True
+        self.thread.start()
+
+    def writeBlocks(self): #thread, blocks of the queue to the stream until None
+        while True:
+            block = self.blocks.get()
+            try:
+                if block is None:
+                    return
+                if self.error is None:
+                    self.stream.write(block)
+            except Exception as error: #raised by the writing side
+                self.error = error
+            finally:
+                self.blocks.task_done()
+
+    def write(self, data):
+        self.pending.append(data)
+        self.size += len(data)
+        if self.size >= STREAM_BLOCK:
+            self.sendPending()
+
+    def sendPending(self):
+        if self.error is not None:
+            raise self.error
+        if self.pending:
+            self.blocks.put(b"".join(self.pending))
+            self.pending = []
+            self.size = 0
+
+    def flush(self): #everything written so far in the stream
+        self.sendPending()
+        self.blocks.join()
+        if self.error is not None:
+            raise self.error
+        self.stream.flush()
+
+    def tell(self):
+        raise ValueError("%s is compressed, snapshots need plain outputs" % self.name)
+
+    def close(self):
+        self.sendPending()
+        self.blocks.put(None)
+        self.thread.join()
+        self.stream.close()
+        if self.error is not None:
+            raise self.error
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
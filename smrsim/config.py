@@ -0,0 +1,48 @@
+#!/usr/bin/env python
+#title           :config.py
+#description     :Simulation parameters shared by every simulator
+#==============================================================================
+
+# coding: utf-8
+
+SECTOR_SIZE = 512 #default 512B
+
+# All sizes are in bytes, defaults are the ones of the command line scripts
+DEFAULTS = {
+    "logsize": 10485760, #size of a persistent cache log (multi log)
+    "group": 104857600, #every n group size (multi log)
+    "bandsize": 10485760, #size of band
+    "disksize": 1099511627776, #size of disk (multi log)
+    "pcsize": 107374182400, #size of the persistent cache (single log)
+    "policy": "A", #A,B,C,shelter (multi log)
+    "noclean": False, #disable clean
+    "placement": "forward", #destination of log swaps: forward, nearest, reserved, see smrsim.allocator (multi log)
+    "live": False, #track the live copy of every logged sector, for live/garbage statistics (multi log)
+    "split": False, #split the output: w/r to persistent cache and cleanup
+    "checkpoint": False, #do checkpoint / clean on very last (oracle)
+    "reboot": False, #do reboot after process has finished (oracle)
+    "idle": False, #swap the logs above 80% full when the trace is idle (oracle)
+    "idle_task": "swap", #swap or clean, what idle periods do to the logs above 80% (oracle)
+    "idle_budget": 0, #log swaps or cleans per idle period at most, 0 for no limit (oracle)
+    "checkpoint_interval": 0, #ms of trace time between two timed checkpoints (whole cleans), 0 for none (oracle)
+}
+
+class Config(object):
+    def __init__(self, **options):
+        unknown = set(options) - set(DEFAULTS)
+        if unknown:
+            raise TypeError("unknown config option(s): " + ", ".join(sorted(unknown)))
+        self.__dict__.update(DEFAULTS)
+        self.__dict__.update(options)
+
+    @classmethod
+    def fromArgs(cls, args): #build from an argparse namespace, ignoring non config arguments
+        return cls(**dict((key, value) for key, value in vars(args).items() if key in DEFAULTS))
+
+    def replace(self, **options): #copy with some options changed
+        merged = dict(self.__dict__)
+        merged.update(options)
+        return Config(**merged)
+
+    def __repr__(self):
+        return "Config(" + ", ".join("%s=%r" % item for item in sorted(self.__dict__.items())) + ")"
@@ -0,0 +1,9 @@
+#!/usr/bin/env python
+#title           :errors.py
+#description     :Exceptions shared by every simulator
+#==============================================================================
+
+# coding: utf-8
+
+class HaltException(Exception): #a full disk or cache, the simulation cannot take the next write
+    pass
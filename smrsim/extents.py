@@ -0,0 +1,19 @@
+#!/usr/bin/env python
+#title           :extents.py
+#description     :Merge logged extents into sorted disjoint ranges
+#==============================================================================
+
+# coding: utf-8
+
+import numpy as np
+
+def mergeExtents(blkno, blkcount): #sorted (blkno, blkcount) arrays of the union of the extents, touching extents are merged
+    if len(blkno) == 0:
+        return blkno, blkcount
+    order = np.argsort(blkno, kind="mergesort")
+    starts = blkno[order]
+    reach = np.maximum.accumulate(starts + blkcount[order]) #furthest end so far
+    #an extent opens a new range when it starts past every extent before it
+    first = np.flatnonzero(np.concatenate(([True], starts[1:] > reach[:-1])))
+    last = np.append(first[1:], len(starts)) - 1
+    return starts[first], reach[last] - starts[first]
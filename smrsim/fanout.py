@@ -0,0 +1,33 @@
+#!/usr/bin/env python
+#title           :fanout.py
+#description     :Feed one trace to several independent simulators in a single pass
+#==============================================================================
+
+# coding: utf-8
+
+from itertools import islice
+
+from smrsim.errors import HaltException
+from smrsim.trace import CHUNK_LINES
+
+def runTogether(sims, events, chunk_events = CHUNK_LINES): #same as sim.run(events) for every sim, the trace is read once
+    # every simulator takes a whole chunk in turn, interleaving them per event thrashes the caches.
+    # A simulator raising HaltException takes no more events, the others go on to the end of the trace.
+    # Returns the halt message of every simulator, None for the ones that ran to the end
+    halted = [None] * len(sims)
+    events = iter(events)
+    while None in halted:
+        chunk = list(islice(events, chunk_events))
+        if not chunk:
+            break
+        for idx, sim in enumerate(sims):
+            if halted[idx] is None:
+                try:
+                    sim.feed(chunk)
+                except HaltException as e:
+                    halted[idx] = str(e)
+    for idx, sim in enumerate(sims):
+        if halted[idx] is None:
+            sim.finish()
+        sim.flushOutput()
+    return halted
@@ -0,0 +1,200 @@
+#!/usr/bin/env python
+#title           :generator.py
+#description     :Seeded synthetic traces, generated a chunk of requests at a time with numpy
+#==============================================================================
+
+# coding: utf-8
+
+import numpy as np
+
+from smrsim.compress import openText
+from smrsim.output import FILE_BUFFER
+from smrsim.trace import CHUNK_LINES, READ, WRITE, isBinaryTrace, traceDtype, writeTextTrace
+
+# Chunks are structured arrays of smrsim.trace, so they stream into a simulator (chunkEvents)
+# or into a text or binary trace file without a python loop per request.
+# Positions and sizes are in sectors, times in ms written with three decimals.
+# Address patterns:
+#   uniform - anywhere on the disk
+#   zipf - request sized slots ranked by a Zipf law of exponent zipf_a, the hot slots scattered over the disk
+#   sequential - back to back runs of run_length requests on average, each run starting anywhere
+PATTERNS = ("uniform", "zipf", "sequential")
+TIME_DTYPE = "S16" #up to ~3 years of trace time
+TICKS_PER_MS = 1000 #times are kept as integer ticks, the three decimals of the output
+READ_PERIOD = 1000 #ms between two iteration reads, not scaled by -t
+ZIPF_STRIDE = 1000003 #prime, scatters consecutive zipf ranks over the slots
+
+DIGIT_GROUPS = np.array(["%04d" % i for i in range(10000)], dtype="S4")
+
+def digitColumns(out, values): #zero padded ascii digits of values into the uint8 columns of out
+    width = out.shape[1]
+    for end in range(width, 0, -4):
+        values, group = np.divmod(values, 10000)
+        start = max(0, end - 4)
+        out[:, start:end] = DIGIT_GROUPS[group].view(np.uint8).reshape(-1, 4)[:, 4 - (end - start):]
+
+def decimalStrings(values, decimals = 0):
+    # byte strings of non-negative ints divided by 10**decimals, like "%d.%03d", without a python loop.
+    # Sorted values make every digit count a contiguous block, others go through a sort
+    values = np.asarray(values, dtype=np.int64)
+    if len(values) == 0:
+        return np.zeros(0, dtype="S1")
+    if np.any(values[1:] < values[:-1]):
+        order = np.argsort(values, kind="mergesort")
+        strings = decimalStrings(values[order], decimals)
+        unsorted = np.empty_like(strings)
+        unsorted[order] = strings
+        return unsorted
+
+    whole, frac = np.divmod(values, 10 ** decimals)
+    extra = decimals + 1 if decimals else 0 #point and decimals
+    ndigits = len(str(int(whole[-1])))
+    out = np.zeros((len(values), ndigits + extra), dtype=np.uint8)
+    bounds = [0] + np.searchsorted(whole, [10 ** d for d in range(1, ndigits)]).tolist() + [len(values)]
+    for d in range(1, ndigits + 1):
+        lo, hi = bounds[d - 1], bounds[d]
+        if lo == hi:
+            continue
+        digitColumns(out[lo:hi, :d], whole[lo:hi])
+        if decimals:
+            out[lo:hi, d] = ord(".")
+            digitColumns(out[lo:hi, d + 1:d + extra], frac[lo:hi])
+    return out.view("S%d" % out.shape[1]).ravel()
+
+def legacyFloatStrings(values):
+    # byte strings of floats as python 2 str() writes them: "%.12g" with ".0" on whole numbers, and an
+    # exponent for the whole numbers of 12 digits (the ".0" would not fit in the precision)
+    values = np.asarray(values, dtype=np.float64)
+    strings = np.char.mod(b"%.12g", values).astype(bytes)
+    strings = strings.astype("S%d" % max(strings.dtype.itemsize + 2, 18)) #room for the ".0" or an exponent
+    whole = (np.char.find(strings, b".") < 0) & (np.char.find(strings, b"e") < 0)
+    big = whole & (np.char.str_len(strings) >= 12)
+    strings[whole] = np.char.add(strings[whole], b".0")
+    for i in np.flatnonzero(big).tolist():
+        mantissa, exponent = ("%.11e" % values[i]).split("e")
+        strings[i] = (mantissa.rstrip("0").rstrip(".") + "e" + exponent).encode("ascii")
+    return strings.astype("S%d" % max(1, np.char.str_len(strings).max())) if len(strings) else strings
+
+class TraceGenerator(object):
+    def __init__(self, disksize, read_size = 8, write_size = 8, pattern = "uniform", zipf_a = 1.2, run_length = 64,
+                 interval = 1.0, poisson = False, seed = None, devno = "0"):
+        if pattern not in PATTERNS:
+            raise ValueError("unknown address pattern: " + str(pattern))
+        self.disksize = disksize
+        self.read_size = read_size
+        self.write_size = write_size
+        self.pattern = pattern
+        self.zipf_a = zipf_a
+        self.run_length = run_length
+        self.interval = int(round(interval * TICKS_PER_MS)) #mean gap between requests
+        self.poisson = poisson #exponential gaps instead of fixed ones
+        self.devno = devno
+        self.rng = np.random.RandomState(seed)
+
+        self.clock = 0 #ticks of the last request
+        self.write_clock = 0.0 #ms of the last iteration write, summed step by step as the original generator did
+        self.next_blkno = None #sequential, where the current run continues
+
+    # --------Start of Request Fields--------
+
+    def addresses(self, sizes): #first sector of every request, requests stay on the disk
+        n = len(sizes)
+        span = self.disksize - sizes + 1
+        if self.pattern == "zipf":
+            slot_size = max(self.read_size, self.write_size)
+            nslots = self.disksize // slot_size
+            stride = ZIPF_STRIDE if nslots % ZIPF_STRIDE else 1
+            ranks = (self.rng.zipf(self.zipf_a, n) - 1) % nslots
+            return np.minimum(ranks * stride % nslots * slot_size, span - 1)
+        starts = (self.rng.random_sample(n) * span).astype(np.int64)
+        if self.pattern == "uniform":
+            return starts
+
+        #sequential: a request opens a new run with probability 1 / run_length, else follows the previous one
+        new_run = self.rng.random_sample(n) < 1.0 / self.run_length
+        if self.next_blkno is None:
+            new_run[0] = True
+        elif not new_run[0]: #the run of the previous chunk goes on
+            starts[0] = self.next_blkno
+        offsets = np.cumsum(sizes) - sizes
+        first = np.maximum.accumulate(np.where(new_run, np.arange(n), 0)) #first request of every run
+        blkno = (starts[first] + offsets - offsets[first]) % span #a run past the end wraps around
+        self.next_blkno = int(blkno[-1] + sizes[-1])
+        return blkno
+
+    def gaps(self, n): #ticks between consecutive requests
+        if self.poisson:
+            return np.rint(self.rng.exponential(self.interval, n)).astype(np.int64)
+        return np.full(n, self.interval, dtype=np.int64)
+
+    def buildChunk(self, ticks, blkno, blkcount, flags, time = None): #time: byte strings of the times, ticks as ms with 3 decimals by default
+        if time is None:
+            time = decimalStrings(ticks, 3)
+        if time.dtype.itemsize > np.dtype(TIME_DTYPE).itemsize:
+            raise ValueError("trace time too large for " + TIME_DTYPE + ": " + str(time[-1]))
+        chunk = np.empty(len(time), dtype=traceDtype(TIME_DTYPE, "S%d" % max(1, len(self.devno))))
+        chunk["time"] = time
+        chunk["devno"] = self.devno
+        chunk["blkno"] = blkno
+        chunk["blkcount"] = blkcount
+        chunk["flag"] = flags
+        return chunk
+
+    # --------End of Request Fields--------
+
+    # --------Start of Traces--------
+
+    def mixChunks(self, count, read_ratio = 0.5, chunk_events = CHUNK_LINES):
+        # count requests, each one a read with probability read_ratio
+        for done in range(0, count, chunk_events):
+            n = min(chunk_events, count - done)
+            flags = (self.rng.random_sample(n) < read_ratio).astype(np.uint8)
+            sizes = np.where(flags == READ, self.read_size, self.write_size).astype(np.int64)
+            blkno = self.addresses(sizes)
+            ticks = self.clock + np.cumsum(self.gaps(n))
+            self.clock = int(ticks[-1])
+            yield self.buildChunk(ticks, blkno, sizes, flags)
+
+    def iterationChunks(self, iterations, numwrites, itertime, chunk_events = CHUNK_LINES):
+        # the classic benchmark: every iteration reads once and writes numwrites times evenly spread
+        # over itertime ms (the write times run across iterations), the read of iteration i at
+        # 10 + 1000 * i ms whatever itertime, as the generator always placed it. The times are written as
+        # it wrote them too: whole ms for the reads, python 2 floats for the writes
+        per_iteration = 1 + numwrites
+        step = round(float(itertime) / numwrites, 3) if numwrites else 0.0
+        pattern = np.array([READ] + [WRITE] * numwrites, dtype=np.uint8)
+        block = max(1, chunk_events // per_iteration)
+        for first in range(0, iterations, block):
+            k = min(block, iterations - first)
+            flags = np.tile(pattern, k)
+            sizes = np.where(flags == READ, self.read_size, self.write_size).astype(np.int64)
+            blkno = self.addresses(sizes)
+            reads = decimalStrings(np.arange(first, first + k, dtype=np.int64) * READ_PERIOD + 10)
+            writes = np.zeros(0, dtype="S1")
+            if numwrites:
+                clock = np.cumsum(np.concatenate(([self.write_clock], np.full(k * numwrites, step))))[1:] #one addition at a time
+                self.write_clock = float(clock[-1])
+                writes = legacyFloatStrings(clock)
+            time = np.empty((k, per_iteration), dtype="S%d" % max(reads.dtype.itemsize, writes.dtype.itemsize))
+            time[:, 0] = reads
+            time[:, 1:] = writes.reshape(k, numwrites)
+            yield self.buildChunk(None, blkno, sizes, flags, time.ravel())
+
+    # --------End of Traces--------
+
+def writeGeneratedTrace(path, chunks, count): #count generated requests to a binary (.npy) or text trace file
+    if isBinaryTrace(path):
+        trace = None
+        idx = 0
+        for chunk in chunks:
+            if trace is None:
+                trace = np.lib.format.open_memmap(path, mode="w+", dtype=chunk.dtype, shape=(count,))
+            trace[idx:idx + len(chunk)] = chunk
+            idx += len(chunk)
+        if trace is not None:
+            trace.flush()
+            del trace
+        return idx
+    with openText(path, "w", FILE_BUFFER) as f:
+        writeTextTrace(f, chunks)
+    return count
@@ -0,0 +1,156 @@
+#!/usr/bin/env python
+#title           :instrument.py
+#description     :Optional hot path counters, clean cost histograms and periodic metrics dumps
+#==============================================================================
+
+# coding: utf-8
+
+import json
+import time
+from itertools import islice
+
+# Instruments replace methods of one simulator and of its output writers by timed ones (instance
+# attributes, the classes stay untouched), counting the calls and cumulative seconds of every name.
+# Counters are inclusive (a clean is also inside the write that triggered it), parse counts events.
+# A timed call costs about a microsecond, simulators without instruments run as before.
+# Clean cost histograms count the cleans by extents scanned and by bands emitted, in power of two buckets.
+# With a dump file, one json line of metrics every interval seconds and one at the end
+HOT_PATHS = ["handleRead", "handleDefaultWrite", "handleShelterWrite", "logSwap", "idleTask", "checkpointTask", "reboot"]
+OUTPUTS = ["result", "result_cleanup", "result_read", "read_reboot", "write_reboot"]
+OUTPUT_METHODS = ["write", "writeId", "writeBands", "writeExtents", "writeArrays", "flush", "close"]
+PARSE_CHUNK = 1 << 14 #events read at once, the granularity of parse timing and dumps
+DUMP_INTERVAL = 10 #seconds
+
+def bucketLabel(bucket): #values of a power of two bucket, bucket = value.bit_length()
+    if bucket == 0:
+        return "0"
+    low, high = 1 << (bucket - 1), (1 << bucket) - 1
+    return str(low) if low == high else "%d-%d" % (low, high)
+
+class Instruments(object):
+    def __init__(self, dump = None, interval = DUMP_INTERVAL):
+        self.counters = {} #name: [calls, seconds]
+        self.clean_extents = {} #bucket: cleans
+        self.clean_bands = {} #bucket: cleans
+        self.bands = None #bands emitted so far by the running clean, None outside cleans
+        self.events = 0
+        self.start = time.time()
+        self.dump = dump
+        self.interval = interval
+        self.next_dump = self.start + interval
+
+    # --------Start of Wrapping--------
+
+    def counter(self, name):
+        if name not in self.counters:
+            self.counters[name] = [0, 0.0]
+        return self.counters[name]
+
+    def timed(self, method, name):
+        counter = self.counter(name)
+        clock = time.time
+        def call(*args):
+            start = clock()
+            try:
+                return method(*args)
+            finally:
+                counter[0] += 1
+                counter[1] += clock() - start
+        return call
+
+    def wrap(self, obj, name, label = None):
+        method = getattr(obj, name, None)
+        if method is not None:
+            setattr(obj, name, self.timed(method, label or name))
+
+    def attach(self, sim): #instrument a simulator and its output writers
+        for name in HOT_PATHS:
+            self.wrap(sim, name)
+        write = sim.handleWrite.__name__ #multi log: an alias of handleDefaultWrite or handleShelterWrite
+        if write not in self.counters:
+            self.wrap(sim, write)
+        sim.handleWrite = getattr(sim, write)
+
+        clean = self.timed(sim.cleanPCache, "cleanPCache")
+        def cleanPCache(*args):
+            extents = sim.loggedExtents(*args[2:])
+            self.bands = 0
+            try:
+                return clean(*args)
+            finally:
+                self.count(self.clean_extents, extents)
+                self.count(self.clean_bands, self.bands)
+                self.bands = None
+        sim.cleanPCache = cleanPCache
+
+        for name in OUTPUTS:
+            out = getattr(sim, name, None)
+            if out is not None:
+                self.attachOutput(out)
+
+    def attachOutput(self, out):
+        for name in OUTPUT_METHODS:
+            self.wrap(out, name, "output")
+        writeBands = out.writeBands
+        def countBands(time, devno, starts, *args):
+            if self.bands is not None:
+                self.bands += len(starts)
+            return writeBands(time, devno, starts, *args)
+        out.writeBands = countBands
+
+    def count(self, histogram, value):
+        bucket = int(value).bit_length()
+        histogram[bucket] = histogram.get(bucket, 0) + 1
+
+    def feed(self, events): #pass the events through, timing the parsing and dumping on the way
+        events = iter(events)
+        counter = self.counter("parse")
+        while True:
+            start = time.time()
+            chunk = list(islice(events, PARSE_CHUNK))
+            counter[0] += len(chunk)
+            counter[1] += time.time() - start
+            if not chunk:
+                return
+            for event in chunk:
+                yield event
+            self.events += len(chunk)
+            if self.dump is not None and time.time() >= self.next_dump:
+                self.dumpMetrics()
+
+    # --------End of Wrapping--------
+
+    # --------Start of User Messages--------
+
+    def metrics(self): #snapshot of every counter and histogram
+        return {
+            "elapsed": round(time.time() - self.start, 3),
+            "events": self.events,
+            "counters": dict((name, {"calls": calls, "seconds": round(seconds, 6)}) for name, (calls, seconds) in self.counters.items()),
+            "clean_extents": dict((bucketLabel(bucket), cleans) for bucket, cleans in self.clean_extents.items()),
+            "clean_bands": dict((bucketLabel(bucket), cleans) for bucket, cleans in self.clean_bands.items()),
+        }
+
+    def dumpMetrics(self):
+        self.dump.write(json.dumps(self.metrics(), sort_keys=True) + "\n")
+        self.dump.flush()
+        self.next_dump = time.time() + self.interval
+
+    def finish(self): #last dump, closes the dump file
+        if self.dump is not None:
+            self.dumpMetrics()
+            self.dump.close()
+            self.dump = None
+
+    def printMetrics(self):
+        print("------------Instrumentation------------")
+        print("%-20s %12s %12s %10s" % ("", "calls", "seconds", "us/call"))
+        for name, (calls, seconds) in sorted(self.counters.items()):
+            if calls > 0:
+                print("%-20s %12d %12.3f %10.2f" % (name, calls, seconds, seconds * 1e6 / calls))
+        for title, histogram in (("extents scanned", self.clean_extents), ("bands emitted", self.clean_bands)):
+            if histogram:
+                print("Cleans by " + title + ": " + ", ".join("%s: %d" % (bucketLabel(bucket), histogram[bucket]) for bucket in sorted(histogram)))
+        print("---------------------------------------")
+
+    # --------End of User Messages--------
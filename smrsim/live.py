@@ -0,0 +1,158 @@
+#!/usr/bin/env python
+#title           :live.py
+#description     :Index of the live copy of every logged sector, for live/garbage statistics
+#==============================================================================
+
+# coding: utf-8
+
+from bisect import bisect_left
+
+import numpy as np
+
+class LiveIndex(object):
+    # Sorted disjoint (start, end, slot) ranges of logical sectors [start, end), slot being the one of the log
+    # holding their live copy. A log's data keeps its slot, so moving a log relabels one slot and emptying a
+    # log retires its slot. Ranges of retired slots are dropped when overwritten or on the next compaction,
+    # a retired slot with no range left is free and the next emptied log takes it. Writes straight to the
+    # disk (big writes of shelter and C) overwrite the logged copies of their sectors
+    def __init__(self, nlogs):
+        self.nlogs = nlogs
+        self.overwritten = 0 #sectors superseded while still logged
+        self.clear()
+
+    def clear(self): #every log empty
+        self.extents = []
+        self.slot_of_log = list(range(self.nlogs))
+        self.log_of_slot = list(range(self.nlogs)) #-1 once retired
+        self.live = [0] * self.nlogs #live sectors of each slot
+        self.range_counts = [0] * self.nlogs #ranges of each slot
+        self.free_slots = [] #retired slots without ranges
+        self.dead_ranges = 0
+
+    def add(self, n, start, count): #sectors [start, start + count) now live in log n
+        if count > 0:
+            self.cover(start, count, self.slot_of_log[n])
+
+    def overwrite(self, start, count): #sectors [start, start + count) written to the disk, no logged copy is live
+        if count > 0:
+            self.cover(start, count, None)
+
+    def cover(self, start, count, slot): #ranges overlapping [start, start + count) lose the overlap, slot takes it (None: no log)
+        end = start + count
+        extents = self.extents
+        live = self.live
+        range_counts = self.range_counts
+        i = bisect_left(extents, (start,)) #first range starting at or after start
+        if i > 0:
+            prev = extents[i - 1]
+            if prev[1] > start: #the previous range runs into the write
+                i -= 1
+            elif prev[1] == start and prev[2] == slot and (i == len(extents) or extents[i][0] >= end):
+                extents[i - 1] = (prev[0], end, slot) #sequential write, grow the previous range
+                live[slot] += count
+                return
+        j = bisect_left(extents, (end,), i) #ranges before j start before end
+        if i == j:
+            if slot is None:
+                return
+            extents.insert(i, (start, end, slot))
+        else:
+            log_of_slot = self.log_of_slot
+            retired = []
+            for old_start, old_end, old in extents[i:j]: #every overlapped range loses the overlap
+                range_counts[old] -= 1
+                if log_of_slot[old] < 0:
+                    self.dead_ranges -= 1
+                    retired.append(old)
+                else:
+                    overlap = min(old_end, end) - max(old_start, start)
+                    live[old] -= overlap
+                    self.overwritten += overlap
+            parts = [(start, end, slot)] if slot is not None else []
+            first = extents[i]
+            last = extents[j - 1]
+            if first[0] < start: #left part of the first range survives
+                parts.insert(0, (first[0], start, first[2]))
+            if last[1] > end: #right part of the last range survives
+                parts.append((end, last[1], last[2]))
+            extents[i:j] = parts
+            for part_start, _, old in parts:
+                if part_start != start: #a surviving part
+                    range_counts[old] += 1
+                    if log_of_slot[old] < 0:
+                        self.dead_ranges += 1
+            for old in set(retired):
+                if range_counts[old] == 0: #its last range is gone
+                    self.free_slots.append(old)
+            if slot is None:
+                return
+        range_counts[slot] += 1
+        live[slot] += count
+
+    def liveSectors(self, n):
+        return self.live[self.slot_of_log[n]]
+
+    def newSlot(self, n): #an empty slot for log n, a free one if any
+        if self.free_slots:
+            slot = self.free_slots.pop()
+            self.log_of_slot[slot] = n
+        else:
+            slot = len(self.log_of_slot)
+            self.log_of_slot.append(n)
+            self.live.append(0)
+            self.range_counts.append(0)
+        self.slot_of_log[n] = slot
+
+    def retire(self, n): #log n emptied, its ranges no longer hold live data
+        self.dropSlot(self.slot_of_log[n])
+        self.newSlot(n)
+
+    def move(self, src, dst): #the data of log src is now log dst, dst was empty
+        self.dropSlot(self.slot_of_log[dst])
+        slot = self.slot_of_log[src]
+        self.slot_of_log[dst] = slot
+        self.log_of_slot[slot] = dst
+        self.newSlot(src)
+
+    def dropSlot(self, slot):
+        self.log_of_slot[slot] = -1
+        self.live[slot] = 0
+        if self.range_counts[slot] == 0:
+            self.free_slots.append(slot)
+            return
+        self.dead_ranges += self.range_counts[slot]
+        if self.dead_ranges > 1024 and 2 * self.dead_ranges > len(self.extents):
+            self.compact()
+
+    def compact(self): #drop the ranges of retired slots, every retired slot is free after
+        log_of_slot = self.log_of_slot
+        self.extents = [extent for extent in self.extents if log_of_slot[extent[2]] >= 0]
+        for slot, log in enumerate(log_of_slot):
+            if log < 0 and self.range_counts[slot] > 0:
+                self.range_counts[slot] = 0
+                self.free_slots.append(slot)
+        self.dead_ranges = 0
+
+    def liveRanges(self): #(start, count) arrays of every live range
+        extents = np.array(self.extents, dtype=np.int64).reshape(-1, 3)
+        alive = np.array(self.log_of_slot, dtype=np.int64)[extents[:, 2]] >= 0
+        return extents[alive, 0], (extents[:, 1] - extents[:, 0])[alive]
+
+    def getState(self): #arrays of the index, for simulator snapshots
+        return {
+            "live_extents": np.array(self.extents, dtype=np.int64).reshape(-1, 3),
+            "live_log_slot": np.array(self.slot_of_log, dtype=np.int64),
+            "live_slot_log": np.array(self.log_of_slot, dtype=np.int64),
+            "live_slot_live": np.array(self.live, dtype=np.int64),
+            "live_slot_ranges": np.array(self.range_counts, dtype=np.int64),
+            "live_counters": np.array([self.overwritten, self.dead_ranges], dtype=np.int64),
+        }
+
+    def setState(self, arrays):
+        self.extents = [tuple(extent) for extent in arrays["live_extents"].tolist()]
+        self.slot_of_log = arrays["live_log_slot"].tolist()
+        self.log_of_slot = arrays["live_slot_log"].tolist()
+        self.live = arrays["live_slot_live"].tolist()
+        self.range_counts = arrays["live_slot_ranges"].tolist()
+        self.overwritten, self.dead_ranges = arrays["live_counters"].tolist()
+        self.free_slots = [slot for slot, log in enumerate(self.log_of_slot) if log < 0 and self.range_counts[slot] == 0]
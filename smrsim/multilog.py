@@ -0,0 +1,541 @@
+#!/usr/bin/env python
+#title           :multilog.py
+#description     :Simulate smr disk with multiple persistent cache
+#==============================================================================
+
+# coding: utf-8
+
+from array import array
+
+import numpy as np
+from bitarray import bitarray
+
+from smrsim.allocator import LogAllocator
+from smrsim.config import SECTOR_SIZE
+from smrsim.live import LiveIndex
+from smrsim.output import asWriter
+from smrsim.errors import HaltException
+from smrsim.trace import READ
+
+# Notes: flags - write -> 0 ; read -> 1; last used pcunit 2147483648
+
+# Policy Notes:
+# 1. POL-A lastTail=latest read - many caches clean
+# 2. POL-B write W to its nearest band's log - single cache clean
+# 3. POL-C lastTail = latest non-logged I/O (all reads OR big writes)
+# 4. Sheltering, small write go to shelter near last tail (offset + size) of the latest big IO
+
+ONE_BIT = bitarray('1')
+
+def zeroBits(length):
+    bits = bitarray(length)
+    bits.setall(False)
+    return bits
+
+class MultiLogSMR(object):
+    SMALL_IO_SIZE = 32 #in KB
+    STATE = ["last_tail", "log_swap_idx", "numberOfClean", "writesPutInPCache", "sectorsPutInPCache", "totalDirtyBands",
+             "totalRead", "liveSectorsCleaned", "garbageSectorsCleaned"] #scalars of a snapshot, see getState
+
+    def __init__(self, config, result, result_cleanup = None):
+        self.config = config
+        self.policy = config.policy
+        self.noclean = config.noclean
+
+        # Constants
+        self.DISK_SIZE = config.disksize // SECTOR_SIZE #default 1TB-1099511627776
+        self.PCACHE_SIZE = config.logsize // SECTOR_SIZE #tantamount to persistent_cache, default 10MB
+        self.BAND_SIZE = config.bandsize // SECTOR_SIZE #default 10MB-10485760
+        self.TOTAL_PCACHE = ((config.disksize // config.group) * config.logsize) // SECTOR_SIZE #default 10GB - 10737418240
+
+        self.band_unit = (config.group - config.logsize) // config.bandsize
+        self.diskset_size = config.group // SECTOR_SIZE
+        self.last_tail = 0 #last tail depends on policy -- (offset + size)
+
+        # Disk element
+        # each log is one flat int64 buffer of blkno,blkcount pairs ('l' is 64-bit on LP64)
+        nlogs = self.DISK_SIZE // self.diskset_size
+        self.pcache = [array('l') for _ in range(nlogs)]
+        self.pcache_fill = [0] * nlogs #sectors currently held by each log
+        self.pcache_hits = [0] * nlogs #band hits (bands per extent, with repeats) of each log
+        self.active_logs = set() #logs holding at least one extent
+        self.allocator = LogAllocator(self.pcache, config.placement) #free logs, the log swap destinations
+        self.log_swap_idx = self.allocator.reserved #last swap destination, put log in 80% of the disk
+
+        # Dirty band bitmaps, updated on every logged write
+        # dirty_disk marks every band dirtied by any log. Only policy B cleans single logs, so only it
+        # keeps a bitmap per log ([first band, bitarray] window) and band_refs (logs dirtying each band)
+        self.dirty_disk = zeroBits(self.DISK_SIZE // self.BAND_SIZE + 1)
+        self.track_log_bands = self.policy == "B"
+        self.log_bands = [None] * nlogs
+        self.band_refs = array('i', [0]) * len(self.dirty_disk) if self.track_log_bands else None
+
+        # Live index, which log holds the live copy of every logged sector (config.live).
+        # It feeds the live/garbage statistics and the reboot write-back, cleans keep the band bitmaps
+        # (an overwritten copy almost always shares its bands with the newer one in the same clean)
+        self.live_index = LiveIndex(nlogs) if config.live else None
+
+        # Output file, plain files are wrapped in a buffered TraceWriter
+        self.result = asWriter(result)
+        self.result_cleanup = asWriter(result_cleanup)
+
+        # Monitoring variables
+        self.numberOfClean = 0
+        self.writesPutInPCache = 0
+        self.sectorsPutInPCache = 0
+        self.totalDirtyBands = 0
+        self.totalRead = 0
+        self.liveSectorsCleaned = 0 #live index only
+        self.garbageSectorsCleaned = 0 #live index only
+
+        if self.policy == "shelter" or self.policy == "C":
+            self.handleWrite = self.handleShelterWrite
+        else: #policy A or B
+            self.handleWrite = self.handleDefaultWrite
+
+    # --------Start of Computation Functions--------
+
+    def nextIdxPCacheN(self, n):
+        return self.pcache_fill[n]
+
+    def extentsPCacheN(self, n): #(blkno,blkcount) pairs of log n
+        return zip(self.pcache[n][0::2], self.pcache[n][1::2])
+
+    def loggedExtents(self, punit_idx = -1): #extents held by log punit_idx, or by every log when -1
+        if punit_idx == -1:
+            return sum(len(self.pcache[n]) for n in self.active_logs) // 2
+        return len(self.pcache[punit_idx]) // 2
+
+    def dirtyBands(self, logs): #sorted dirty bands of the given logs and the number of band hits (with repeats)
+        BAND_SIZE = self.BAND_SIZE
+        ext = np.concatenate([np.frombuffer(log, dtype='l') for log in logs])
+        blkno = ext[0::2]
+        blkcount = ext[1::2]
+        starting_band = blkno // BAND_SIZE
+        band_count = (blkcount + (blkno % BAND_SIZE) + BAND_SIZE - 1) // BAND_SIZE #ceil
+        #expand each [starting_band, starting_band + band_count) into its bands, then dedup by sorting
+        band_end = np.cumsum(band_count)
+        hits = int(band_end[-1]) if len(band_end) > 0 else 0
+        bands = np.repeat(starting_band - (band_end - band_count), band_count) + np.arange(hits)
+        return np.unique(bands).tolist(), hits
+
+    def markDirtyBands(self, n, blkno, blkcount): #mark the bands dirtied by an extent logged in log n, returns the band count
+        BAND_SIZE = self.BAND_SIZE
+        dirty_disk = self.dirty_disk
+        starting_band = blkno // BAND_SIZE
+        ending_band = starting_band + (blkcount + (blkno % BAND_SIZE) + BAND_SIZE - 1) // BAND_SIZE #ceil
+        if ending_band > len(dirty_disk): #extent runs past the last band
+            if self.track_log_bands:
+                self.band_refs.extend([0] * (ending_band - len(dirty_disk)))
+            dirty_disk.extend(zeroBits(ending_band - len(dirty_disk)))
+        dirty_disk[starting_band:ending_band] = True
+
+        if self.track_log_bands and ending_band > starting_band:
+            if self.log_bands[n] is None:
+                self.log_bands[n] = [starting_band, bitarray()]
+            window = self.log_bands[n]
+            if starting_band < window[0]: #grow the window to the left
+                window[1] = zeroBits(window[0] - starting_band) + window[1]
+                window[0] = starting_band
+            if ending_band - window[0] > len(window[1]): #grow the window to the right
+                window[1].extend(zeroBits(ending_band - window[0] - len(window[1])))
+            first, bits = window
+            band_refs = self.band_refs
+            for band in range(starting_band, ending_band):
+                if not bits[band - first]:
+                    bits[band - first] = True
+                    band_refs[band] += 1
+
+        return ending_band - starting_band
+
+    def takeDirtyBands(self, punit_idx = -1): #sorted dirty bands of log punit_idx (-1 = whole disk), cleared on return
+        band_refs = self.band_refs
+        if punit_idx == -1: #whole disk
+            bands = list(self.dirty_disk.search(ONE_BIT))
+            self.dirty_disk.setall(False)
+            if self.track_log_bands:
+                for band in bands:
+                    band_refs[band] = 0
+            return bands
+
+        window = self.log_bands[punit_idx]
+        self.log_bands[punit_idx] = None
+        if window is None:
+            return []
+        first, bits = window
+        bands = [first + i for i in bits.search(ONE_BIT)]
+        for band in bands:
+            band_refs[band] -= 1
+            if band_refs[band] == 0: #no other log dirties this band
+                self.dirty_disk[band] = False
+        return bands
+
+    def dirtyBandCount(self, n = -1): #dirty bands of log n, or of the whole disk when n = -1
+        if n == -1:
+            return self.dirty_disk.count()
+        if self.track_log_bands:
+            return self.log_bands[n][1].count() if self.log_bands[n] is not None else 0
+        return len(self.dirtyBands([self.pcache[n]])[0])
+
+    def liveSectors(self, n): #sectors of log n not overwritten since, live index only
+        return self.live_index.liveSectors(n)
+
+    def garbageSectors(self, n): #sectors of log n overwritten since, live index only
+        return self.pcache_fill[n] - self.live_index.liveSectors(n)
+
+    def computeDiskBlkNo(self, blkno): #basically, this function means we add with the size of n PCACHE_SIZE before
+        return blkno + (blkno // (self.BAND_SIZE * self.band_unit) + 1) * self.PCACHE_SIZE
+
+    # --------End of Computation Functions--------
+
+    # --------Start of Log Bookkeeping--------
+
+    def appendExtent(self, n, blkno, blkcount):
+        self.pcache[n].extend((blkno, blkcount))
+        self.pcache_fill[n] += blkcount
+        self.pcache_hits[n] += self.markDirtyBands(n, blkno, blkcount)
+        self.active_logs.add(n)
+        if self.live_index is not None:
+            self.live_index.add(n, blkno, blkcount)
+
+    def moveLog(self, src, dst): #move the data of log src to log dst
+        self.pcache[dst] = self.pcache[src]
+        self.pcache_fill[dst] = self.pcache_fill[src]
+        self.pcache_hits[dst] = self.pcache_hits[src]
+        self.log_bands[dst] = self.log_bands[src]
+        self.pcache[src] = array('l')
+        self.pcache_fill[src] = 0
+        self.pcache_hits[src] = 0
+        self.log_bands[src] = None
+        self.allocator.release(src)
+        if src in self.active_logs:
+            self.active_logs.remove(src)
+            self.active_logs.add(dst)
+        if self.live_index is not None:
+            self.live_index.move(src, dst)
+
+    def clearPCache(self, punit_idx = -1): #empty log punit_idx, or every log when -1
+        if self.live_index is not None:
+            #METRICS part - live and overwritten sectors of the cleaned logs
+            for n in (self.active_logs if punit_idx == -1 else [punit_idx]):
+                live = self.liveSectors(n)
+                self.liveSectorsCleaned += live
+                self.garbageSectorsCleaned += self.pcache_fill[n] - live
+            if punit_idx == -1:
+                self.live_index.clear()
+            else:
+                self.live_index.retire(punit_idx)
+
+        if punit_idx == -1: #whole clean
+            for n in self.active_logs:
+                self.pcache[n] = array('l')
+                self.pcache_fill[n] = 0
+                self.pcache_hits[n] = 0
+                self.log_bands[n] = None
+                self.allocator.release(n)
+            self.active_logs.clear()
+        else: #single clean
+            del self.pcache[punit_idx][:]
+            self.pcache_fill[punit_idx] = 0
+            self.pcache_hits[punit_idx] = 0
+            self.allocator.release(punit_idx)
+            self.active_logs.discard(punit_idx)
+
+    def nextSwapTarget(self, src): #empty log to swap log src to, see smrsim.allocator for the placements
+        self.log_swap_idx = self.allocator.take(src, self.log_swap_idx)
+        return self.log_swap_idx
+
+    # --------End of Log Bookkeeping--------
+
+    # --------Start of Snapshots--------
+
+    def getState(self): #(scalars, arrays) to resume the simulation from, see smrsim.snapshot
+        # the logged extents of every log back to back, fills, hits and band bitmaps follow from them
+        logs = [np.frombuffer(log, dtype='l') for log in self.pcache if len(log) > 0]
+        arrays = {
+            "pcache": np.concatenate(logs) if logs else np.zeros(0, dtype='l'),
+            "pcache_lengths": np.array([len(log) for log in self.pcache], dtype=np.int64),
+        }
+        if self.live_index is not None:
+            arrays.update(self.live_index.getState())
+        return dict((name, getattr(self, name)) for name in self.STATE), arrays
+
+    def setState(self, scalars, arrays): #state of getState, on a simulator that has not simulated anything yet
+        lengths = arrays["pcache_lengths"].tolist()
+        if len(lengths) != len(self.pcache):
+            raise ValueError("snapshot of a disk of %d logs, this disk has %d" % (len(lengths), len(self.pcache)))
+        for name in self.STATE:
+            setattr(self, name, scalars[name])
+        extents = arrays["pcache"].tolist()
+        start = 0
+        for n, length in enumerate(lengths):
+            if length > 0:
+                log = array('l', extents[start:start + length])
+                self.pcache[n] = log
+                self.pcache_fill[n] = sum(log[1::2])
+                self.pcache_hits[n] = sum(self.markDirtyBands(n, blkno, blkcount) for blkno, blkcount in zip(log[0::2], log[1::2]))
+                self.active_logs.add(n)
+                start += length
+        if self.live_index is not None:
+            if "live_extents" not in arrays:
+                raise ValueError("snapshot taken without the live index")
+            self.live_index.setState(arrays)
+
+    # --------End of Snapshots--------
+
+    # --------Start of Read,Write,Clean--------
+
+    def writeIO(self, time, devno, blkno, blkcount, flag):
+        self.result.write(time, devno, blkno, blkcount, flag)
+
+    def prepareIO(self, positions, times, devnos, blknos, blkcounts, flags): #writeIO of a batch, see feedChunk
+        return self.result.prepareRows(times, devnos, blknos, blkcounts, flags)
+
+    def writePreparedIO(self, rows, start, stop):
+        self.result.writePrepared(rows, start, stop)
+
+    def writeCleanBands(self, time, devno, starts): #read then write of every band starting at starts
+        out = self.result if self.result_cleanup is None else self.result_cleanup
+        out.writeBands(time, devno, starts, self.BAND_SIZE)
+
+    def logSwap(self, time, devno, punit_idx):
+        log_swap_idx = self.nextSwapTarget(punit_idx)
+
+        #read the log
+        self.result.write(time, devno, punit_idx * self.diskset_size, self.PCACHE_SIZE, 1)
+        #do the swap! - read swap target
+        self.result.write(time, devno, log_swap_idx * self.diskset_size, self.PCACHE_SIZE, 1)
+        #do the swap! - write swap target
+        self.result.write(time, devno, log_swap_idx * self.diskset_size, self.PCACHE_SIZE, 0)
+
+        self.moveLog(punit_idx, log_swap_idx)
+
+    def cleanPCache(self, time, devno, punit_idx = -1): #idx = -1 = whole
+        dirty_band = self.takeDirtyBands(punit_idx)
+        #METRICS part - total dirty band, used for average dirty bands per clean
+        if punit_idx == -1: #whole clean
+            self.totalDirtyBands += sum(self.pcache_hits[n] for n in self.active_logs)
+        else: #single clean
+            self.totalDirtyBands += self.pcache_hits[punit_idx]
+
+        BAND_SIZE, PCACHE_SIZE, band_unit = self.BAND_SIZE, self.PCACHE_SIZE, self.band_unit
+        self.writeCleanBands(time, devno, [band * BAND_SIZE + (band // band_unit + 1) * PCACHE_SIZE for band in dirty_band])
+
+        self.clearPCache(punit_idx)
+
+    def handleFullLog(self, time, devno, n): #log n has no room left for the incoming write
+        #METRICS part - increment number of clean
+        self.numberOfClean += 1
+        if self.noclean: #NoClean
+            self.logSwap(time, devno, n)
+        else: #do cleanup!
+            if self.policy == "B":
+                self.cleanPCache(time, devno, n)
+            else: #policy A or C or shelter
+                self.cleanPCache(time, devno)
+
+    def handleRead(self, time, devno, blkno, blkcount):
+        #METRICS part - increment total read
+        self.totalRead += 1
+
+        #start of the read part
+        blkno = self.computeDiskBlkNo(blkno)
+        self.writeIO(time, devno, blkno, blkcount, 1)
+        #end of the read part
+
+        #if policy A or (shelter and bigIO), save the tail
+        policy = self.policy
+        if policy == "A" or policy == "C" or (policy == "shelter" and blkcount * 0.5 > self.SMALL_IO_SIZE):
+            self.last_tail = (blkcount + blkno)
+
+    def handleDefaultWrite(self, time, devno, blkno, blkcount):
+    #DEFAULT: write goes to the persistent cache / log
+        #METRICS part - writes and sectors put in persistent cache
+        self.writesPutInPCache += 1
+        self.sectorsPutInPCache += blkcount
+
+        if self.policy == "B":
+            idx_point = self.computeDiskBlkNo(blkno)
+        else: #policy A or policy C or shelter
+            idx_point = self.last_tail
+        n = idx_point // self.diskset_size
+
+        #clean or reset if not enough space
+        if self.pcache_fill[n] + blkcount > self.PCACHE_SIZE:
+            self.handleFullLog(time, devno, n)
+
+        #start of the write part
+        write_target = n * self.diskset_size + self.pcache_fill[n]
+        self.writeIO(time, devno, write_target, blkcount, 0)
+        self.appendExtent(n, blkno, blkcount)
+        #end of the write part
+
+    def handleShelterWrite(self, time, devno, blkno, blkcount):
+        if (blkcount * 0.5) <= self.SMALL_IO_SIZE: #small request, use the log
+            self.handleDefaultWrite(time, devno, blkno, blkcount)
+        else: #bigIO, this part writes do not go to log
+            if self.live_index is not None: #the logged copies of these sectors are stale now
+                self.live_index.overwrite(blkno, blkcount)
+            #basically, just copy paste from read and some trivial changes
+            blkno = self.computeDiskBlkNo(blkno)
+            self.writeIO(time, devno, blkno, blkcount, 0)
+            #end of the write part
+            if self.policy == "C":
+                self.last_tail = (blkcount + blkno)
+
+    def handleEvent(self, time, devno, blkno, blkcount, flag):
+        if flag == READ: #read
+            self.handleRead(time, devno, blkno, blkcount)
+        else: #write
+            self.handleWrite(time, devno, blkno, blkcount)
+
+    def run(self, events): #simulate a whole trace, see smrsim.trace for the event format
+        self.feed(events)
+        self.finish()
+        self.flushOutput()
+
+    def feed(self, events): #simulate the next events of the trace
+        handleRead = self.handleRead
+        handleWrite = self.handleWrite
+        for time, devno, blkno, blkcount, flag in events:
+            if flag == READ: #read
+                handleRead(time, devno, blkno, blkcount)
+            else: #write
+                handleWrite(time, devno, blkno, blkcount)
+
+    def runChunks(self, chunks): #run of structured chunks (smrsim.trace.readTraceChunks), batched, see feedChunk
+        for chunk in chunks:
+            self.feedChunk(chunk)
+        self.finish()
+        self.flushOutput()
+
+    def bulkRequests(self, chunk): #masks of the requests of a chunk that leave the logs alone and of those setting last_tail
+        reads = chunk["flag"] == READ
+        big = chunk["blkcount"] * 0.5 > self.SMALL_IO_SIZE
+        policy = self.policy
+        bulk = reads | big if policy == "shelter" or policy == "C" else reads
+        if policy == "A":
+            tail = reads
+        elif policy == "C":
+            tail = bulk
+        elif policy == "shelter":
+            tail = reads & big
+        else: #policy B
+            tail = np.zeros(len(chunk), dtype=bool)
+        return bulk, tail
+
+    def feedChunk(self, chunk): #feed of a structured chunk, same outputs and state
+        # Reads, and the big writes of shelter and C, only remap their block and emit a line: they are remapped
+        # and formatted for the whole chunk at once, then written a run at a time in between the writes that go
+        # to a log, which take the scalar path. Before each of those last_tail is set from the last bulk request
+        # setting it, the scalar path never does
+        bulk, tail = self.bulkRequests(chunk)
+        positions = np.flatnonzero(bulk)
+        rows = chunk[positions]
+        blknos = self.computeDiskBlkNo(rows["blkno"])
+        blkcounts = rows["blkcount"]
+        prepared = self.prepareIO(positions, rows["time"].tolist(), rows["devno"].tolist(), blknos.tolist(), blkcounts.tolist(), rows["flag"].tolist())
+        tails = (blknos + blkcounts).tolist()
+        last_tails = np.maximum.accumulate(np.where(tail[positions], np.arange(len(positions)), -1)).tolist() #index of the last tail setter
+
+        handleWrite = self.handleWrite
+        done = 0 #bulk requests written
+        writes = np.flatnonzero(~bulk)
+        for k, (position, (time, devno, blkno, blkcount, flag)) in enumerate(zip(writes.tolist(), chunk[writes].tolist())):
+            stop = position - k #bulk requests before this one
+            if stop > done:
+                self.writePreparedIO(prepared, done, stop)
+                if self.live_index is not None:
+                    self.overwriteBulk(rows, done, stop)
+                if last_tails[stop - 1] >= 0:
+                    self.last_tail = tails[last_tails[stop - 1]]
+                done = stop
+            try:
+                handleWrite(time, devno, blkno, blkcount)
+            except HaltException: #the reads before the halting write are counted, as feed does
+                self.totalRead += int(np.count_nonzero(chunk["flag"][:position] == READ))
+                raise
+        if len(positions) > done:
+            self.writePreparedIO(prepared, done, len(positions))
+            if self.live_index is not None:
+                self.overwriteBulk(rows, done, len(positions))
+            if last_tails[-1] >= 0:
+                self.last_tail = tails[last_tails[-1]]
+        self.totalRead += int(np.count_nonzero(chunk["flag"] == READ))
+
+    def overwriteBulk(self, rows, start, stop): #live index, the big writes among the bulk rows start to stop, as handleShelterWrite
+        rows = rows[start:stop]
+        writes = rows[rows["flag"] != READ]
+        for blkno, blkcount in zip(writes["blkno"].tolist(), writes["blkcount"].tolist()):
+            self.live_index.overwrite(blkno, blkcount)
+
+    def finish(self): #end of trace
+        pass
+
+    def flushOutput(self): #write out what the output writers still buffer
+        for out in (self.result, self.result_cleanup):
+            if out is not None:
+                out.flush()
+
+    # --------End of Read,Write,Clean--------
+
+    # --------Start of User Messages--------
+
+    def printSectorsToLog(self, target):
+        for fill in self.pcache_fill:
+            target.write("%s\n" % int(fill * 0.5)) #in KB
+
+    def printLiveSectorsToLog(self, target): #live and garbage KB of every log, live index only
+        for n, fill in enumerate(self.pcache_fill):
+            live = self.liveSectors(n)
+            target.write("%s %s\n" % (int(live * 0.5), int((fill - live) * 0.5)))
+
+    def printConfiguration(self):
+        print("------------Configuration------------")
+        print("Persistent cache size: " + "%.3f" % (float(self.TOTAL_PCACHE * SECTOR_SIZE) / 1048576) + " MB")
+        print("Band size: " + "%.3f" % (float(self.BAND_SIZE * SECTOR_SIZE) / 1048576) + " MB")
+        print("Bands that follow a persistent cache unit: " + str(self.band_unit))
+        print("Total shelters: " + str(self.DISK_SIZE // self.diskset_size))
+        print("-------------------------------------")
+
+    def printSummary(self):
+        print("------------Result Summary------------")
+        print("Number of clean or number of log swap: " + str(self.numberOfClean))
+        print("Total writes to persistent cache: " + str(self.writesPutInPCache))
+        print("Total read to disk: " + str(self.totalRead))
+        print("Total sectors to persistent cache: " + str(self.sectorsPutInPCache))
+        if self.numberOfClean > 0:
+            print("Averages dirty bands per clean: " + str(float(self.totalDirtyBands) / self.numberOfClean))
+        if self.live_index is not None:
+            self.printLiveSummary()
+        print("--------------------------------------")
+
+    def printLiveSummary(self):
+        live = sum(self.liveSectors(n) for n in self.active_logs)
+        print("Live sectors in persistent cache: " + str(live))
+        print("Garbage sectors in persistent cache: " + str(sum(self.pcache_fill) - live))
+        print("Sectors overwritten while logged: " + str(self.live_index.overwritten))
+        print("Live sectors cleaned: " + str(self.liveSectorsCleaned))
+        print("Garbage sectors cleaned: " + str(self.garbageSectorsCleaned))
+
+    def summary(self): #figures of printSummary, for sweeps and scripts
+        result = {
+            "clean_count": self.numberOfClean,
+            "writes_to_pcache": self.writesPutInPCache,
+            "reads_to_disk": self.totalRead,
+            "sectors_to_pcache": self.sectorsPutInPCache,
+            "total_dirty_bands": self.totalDirtyBands,
+            "avg_dirty_bands_per_clean": float(self.totalDirtyBands) / self.numberOfClean if self.numberOfClean > 0 else None,
+        }
+        if self.live_index is not None:
+            live = sum(self.liveSectors(n) for n in self.active_logs)
+            result.update({
+                "live_sectors": live,
+                "garbage_sectors": sum(self.pcache_fill) - live,
+                "overwritten_sectors": self.live_index.overwritten,
+                "live_sectors_cleaned": self.liveSectorsCleaned,
+                "garbage_sectors_cleaned": self.garbageSectorsCleaned,
+            })
+        return result
+
+    # --------End of User Messages--------
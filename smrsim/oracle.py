@@ -0,0 +1,332 @@
+#!/usr/bin/env python
+#title           :oracle.py
+#description     :Multiple persistent cache smr disk with log swap, idle time oracle and reboot
+#==============================================================================
+
+# coding: utf-8
+
+import numpy as np
+
+from smrsim.extents import mergeExtents
+from smrsim.multilog import MultiLogSMR
+from smrsim.output import asWriter
+from smrsim.scheduler import Scheduler
+
+class OracleSMR(MultiLogSMR):
+    SMALL_IO_SIZE = 256 #in KB
+
+    #idle time
+    IDLE_TIME = 100 #ms
+    DELAY_TIME = 20 #ms
+    SWAP_THRESHOLD = 0.8 #logs fuller than this share of a log are swapped or cleaned when idle
+
+    STATE = MultiLogSMR.STATE + ["last_time", "swap_count", "swap_idle", "swap_full", "io_id", "ls_id", "cc_id",
+                                 "idle_at", "idle_epoch", "last_devno", "clean_idle", "timed_checkpoints", "idle_dirty_bands",
+                                 "checkpoint_dirty_bands"]
+
+    def __init__(self, config, result, result_cleanup = None, result_read = None, read_reboot = None, write_reboot = None):
+        MultiLogSMR.__init__(self, config, asWriter(result, ids=True), result_cleanup)
+        self.checkpoint = config.checkpoint
+        self.reboot_enabled = config.reboot
+
+        # Output file
+        self.result_read = asWriter(result_read)
+        self.read_reboot = asWriter(read_reboot)
+        self.write_reboot = asWriter(write_reboot)
+
+        self.last_time = 0
+        self.swap_count = 0
+        self.swap_idle = 0
+        self.swap_full = 0
+
+        # Background tasks, timed events run between the requests by the scheduler, their outputs carry
+        # the time they are scheduled at:
+        # - idle time (config.idle): IDLE_TIME after a request with no other request, the disk is idle and
+        #   swaps (or cleans, config.idle_task) its fullest log above the swap threshold, then the next one
+        #   DELAY_TIME later, config.idle_budget tasks at most (0: no limit). A request ends the idle period,
+        #   its pending tasks are dropped. Logs above the threshold are kept in hot_logs as they get written
+        # - timed checkpoints (config.checkpoint_interval): a whole clean every interval ms of trace time
+        self.scheduler = Scheduler(self)
+        self.idle = config.idle
+        self.idle_task = config.idle_task
+        self.idle_budget = config.idle_budget
+        self.checkpoint_interval = config.checkpoint_interval
+        self.swap_threshold = self.SWAP_THRESHOLD * self.PCACHE_SIZE
+        self.hot_logs = set()
+        self.idle_at = None #time the disk goes idle unless a request comes first, None before the first request
+        self.idle_epoch = 0 #requests end idle periods, tasks of an ended one are dropped
+        self.last_devno = "0"
+        self.clean_idle = 0
+        self.timed_checkpoints = 0
+        self.idle_dirty_bands = 0 #distinct dirty bands of the idle cleans and of the timed checkpoints,
+        self.checkpoint_dirty_bands = 0 #kept out of totalDirtyBands and its average per clean at full log
+        if config.idle or config.checkpoint_interval > 0:
+            self.handleEvent = self.handleTimedEvent
+        if config.idle:
+            self.appendExtent = self.appendHotExtent
+
+        #save the id
+        self.io_id = 0 #LS(log swap),CC(clean cache),IO(read/write), RB(reboot)
+        self.ls_id = 0
+        self.cc_id = 0
+
+    # --------Start of Computation Functions--------
+
+    def computeDiskBlkNo(self, blkno): #basically, this function means we add with the size of n PCACHE_SIZE before..
+        return blkno + (blkno // (self.diskset_size - self.PCACHE_SIZE) + 1) * self.PCACHE_SIZE
+
+    # --------End of Computation Functions--------
+
+    # --------Start of Log Bookkeeping--------
+
+    def appendHotExtent(self, n, blkno, blkcount): #appendExtent of config.idle
+        MultiLogSMR.appendExtent(self, n, blkno, blkcount)
+        if self.pcache_fill[n] > self.swap_threshold:
+            self.hot_logs.add(n)
+
+    def moveLog(self, src, dst): #the moved data is parked, dst only gets hot again when written
+        MultiLogSMR.moveLog(self, src, dst)
+        self.hot_logs.discard(src)
+
+    def clearPCache(self, punit_idx = -1):
+        MultiLogSMR.clearPCache(self, punit_idx)
+        if punit_idx == -1:
+            self.hot_logs.clear()
+        else:
+            self.hot_logs.discard(punit_idx)
+
+    def getState(self):
+        scalars, arrays = MultiLogSMR.getState(self)
+        scalars["scheduler"] = self.scheduler.getState()
+        arrays["hot_logs"] = np.array(sorted(self.hot_logs), dtype=np.int64)
+        return scalars, arrays
+
+    def setState(self, scalars, arrays):
+        MultiLogSMR.setState(self, scalars, arrays)
+        self.scheduler.setState(scalars["scheduler"])
+        self.last_devno = str(self.last_devno) #json gives unicode
+        self.hot_logs = set(arrays["hot_logs"].tolist())
+
+    # --------End of Log Bookkeeping--------
+
+    # --------Start of Read,Write,Clean--------
+
+    def writeIO(self, time, devno, blkno, blkcount, flag):
+        self.result.writeId("IO", self.io_id, time, devno, blkno, blkcount, flag)
+        self.io_id += 1
+
+    def prepareIO(self, positions, times, devnos, blknos, blkcounts, flags): #every request has one IO id, in trace order
+        return self.result.prepareRows(times, devnos, blknos, blkcounts, flags, "IO", (positions + self.io_id).tolist())
+
+    def writePreparedIO(self, rows, start, stop):
+        self.result.writePrepared(rows, start, stop)
+        self.io_id += stop - start
+
+    def writeCleanBands(self, time, devno, starts): #one CC id per band
+        if self.result_cleanup is None:
+            self.result.writeBands(time, devno, starts, self.BAND_SIZE, "CC", self.cc_id)
+        else:
+            self.result_cleanup.writeBands(time, devno, starts, self.BAND_SIZE)
+        self.cc_id += len(starts)
+
+    def logSwap(self, time, devno, punit_idx):
+        self.swap_count += 1
+
+        # search for empty place in persistent cache
+        log_swap_idx = self.nextSwapTarget(punit_idx)
+
+        #do the swap! - write swap target
+        self.result.writeId("LS", self.ls_id, time, devno, log_swap_idx * self.diskset_size, self.PCACHE_SIZE, 0)
+        self.ls_id += 1
+
+        self.moveLog(punit_idx, log_swap_idx)
+
+    # --------Start of Background Tasks--------
+
+    def idleTask(self, time, epoch, done): #one swap or clean of an idle period, the next one DELAY_TIME later
+        if epoch != self.idle_epoch or not self.hot_logs: #a request came, or nothing left to do
+            return
+        fill = self.pcache_fill
+        n = max(self.hot_logs, key=lambda i: (fill[i], -i))
+        if self.idle_task == "clean":
+            self.idle_dirty_bands += self.backgroundClean(time, n if self.policy == "B" else -1)
+            self.clean_idle += 1
+        else:
+            self.logSwap(str(time), self.last_devno, n)
+            self.swap_idle += 1
+        if self.idle_budget == 0 or done + 1 < self.idle_budget:
+            self.scheduler.schedule(time + self.DELAY_TIME, "idleTask", epoch, done + 1)
+
+    def checkpointTask(self, time): #timed checkpoint, a whole clean, then the next one
+        self.checkpoint_dirty_bands += self.backgroundClean(time)
+        self.timed_checkpoints += 1
+        self.scheduler.schedule(time + self.checkpoint_interval, "checkpointTask")
+
+    def backgroundClean(self, time, punit_idx = -1): #clean of a background task, returns its distinct dirty bands
+        bands = self.totalDirtyBands
+        self.cleanPCache(str(time), self.last_devno, punit_idx)
+        cleaned = self.totalDirtyBands - bands
+        self.totalDirtyBands = bands
+        return cleaned
+
+    # --------End of Background Tasks--------
+
+    def reboot(self):
+        print("Start doing reboot...")
+        logs = sorted(self.active_logs)
+
+        # READ PART - Read all sheltered contents
+        for i in logs:
+            # read
+            self.read_reboot.write("000.000", "0", i * self.diskset_size, self.nextIdxPCacheN(i), 1)
+        # the logged extents, straight from the log buffers, at their disk position
+        ext = np.concatenate([np.frombuffer(self.pcache[i], dtype='l') for i in logs]) if logs else np.zeros(0, dtype='l')
+        blkno = self.computeDiskBlkNo(ext[0::2])
+        blkcount = ext[1::2]
+        print("Finished read...")
+        # END OF READ PART
+
+        # WRITE PART - first merge all consecutive and overlapped IOs
+        if self.live_index is not None: #only the live copies go back
+            live_blkno, live_blkcount = self.live_index.liveRanges()
+            reboot_blkno, reboot_blkcount = mergeExtents(self.computeDiskBlkNo(live_blkno), live_blkcount)
+        else:
+            reboot_blkno, reboot_blkcount = mergeExtents(blkno, blkcount)
+
+        print("Finished write reboot array...")
+
+        # Write them to the original position
+        self.write_reboot.writeExtents("000.000", "0", reboot_blkno, reboot_blkcount, 0)
+
+        count_orig_io = len(blkno)
+        count_reboot_io = len(reboot_blkno)
+        total_orig_size = int(blkcount.sum())
+        total_reboot_size = int(reboot_blkcount.sum())
+        io_reduced = (float(count_orig_io - count_reboot_io) / count_orig_io) * 100 if count_orig_io > 0 else 0.0
+        sector_reduced = (float(total_orig_size - total_reboot_size) / total_orig_size) * 100 if total_orig_size > 0 else 0.0
+
+        print("------------Reboot Data------------")
+        print("Count of original logged IO: " + str(count_orig_io))
+        print("Total size original logged IO: " + str(total_orig_size) + " sectors")
+        print("Count of IO on reboot: " + str(count_reboot_io))
+        print("Total size of IO on reboot: " + str(total_reboot_size) + " sectors")
+        print("% IO reduced: " + "%.2f" % io_reduced + "%")
+        print("% Sectors reduced: " + "%.2f" % sector_reduced + "%")
+        print("-------------------------------------")
+
+    def cleanPCache(self, time, devno, punit_idx = -1): #idx = -1 = whole
+        if punit_idx == -1: #whole clean
+            for i in sorted(self.active_logs):
+                #read to the log first
+                if self.result_cleanup is None:
+                    self.result.writeId("CC", self.cc_id, time, devno, i * self.diskset_size, self.nextIdxPCacheN(i), 1)
+                    self.cc_id += 1
+                else:
+                    self.result_read.write(time, devno, i * self.diskset_size, self.nextIdxPCacheN(i), 1)
+        dirty_band = self.takeDirtyBands(punit_idx)
+        #METRICS part - distinct dirty bands, used for average dirty bands per clean
+        self.totalDirtyBands += len(dirty_band)
+
+        BAND_SIZE, PCACHE_SIZE, band_unit = self.BAND_SIZE, self.PCACHE_SIZE, self.band_unit
+        self.writeCleanBands(time, devno, [band * BAND_SIZE + (band // band_unit + 1) * PCACHE_SIZE for band in dirty_band])
+
+        self.clearPCache(punit_idx)
+
+    def handleFullLog(self, time, devno, n):
+        if self.noclean: #NoClean
+            self.logSwap(time, devno, n)
+            self.swap_full += 1
+        else: #do cleanup!
+            #METRICS part - increment number of clean
+            self.numberOfClean += 1
+            if self.policy == "B":
+                self.cleanPCache(time, devno, n)
+            else: #policy A or C or shelter
+                self.cleanPCache(time, devno)
+
+    def handleEvent(self, time, devno, blkno, blkcount, flag):
+        self.last_time = float(time)
+        MultiLogSMR.handleEvent(self, time, devno, blkno, blkcount, flag)
+
+    def handleTimedEvent(self, time, devno, blkno, blkcount, flag): #handleEvent with background tasks
+        now = float(time)
+        if self.idle_at is None: #first request
+            if self.checkpoint_interval > 0:
+                self.scheduler.schedule(now + self.checkpoint_interval, "checkpointTask")
+        elif self.idle and now > self.idle_at: #idle since idle_at
+            self.scheduler.schedule(self.idle_at, "idleTask", self.idle_epoch, 0)
+        self.scheduler.runUntil(now)
+        self.idle_epoch += 1
+        self.idle_at = now + self.IDLE_TIME
+        self.last_time = now
+        self.last_devno = devno
+        MultiLogSMR.handleEvent(self, time, devno, blkno, blkcount, flag)
+
+    def feed(self, events):
+        handleEvent = self.handleEvent
+        for time, devno, blkno, blkcount, flag in events:
+            handleEvent(time, devno, blkno, blkcount, flag)
+
+    def feedChunk(self, chunk):
+        if self.idle or self.checkpoint_interval > 0: #background tasks run between any two requests, no batches
+            self.feed(chunk.tolist())
+            return
+        MultiLogSMR.feedChunk(self, chunk)
+        if len(chunk):
+            self.last_time = float(chunk["time"][-1])
+
+    def finish(self):
+        if self.reboot_enabled:
+            self.reboot()
+
+        #future use: modify time and devno appropriately
+        if self.checkpoint:
+            self.cleanPCache("000", "0")
+
+    def flushOutput(self):
+        MultiLogSMR.flushOutput(self)
+        for out in (self.result_read, self.read_reboot, self.write_reboot):
+            if out is not None:
+                out.flush()
+
+    # --------End of Read,Write,Clean--------
+
+    # --------Start of User Messages--------
+
+    def printSummary(self):
+        print("------------Result Summary------------")
+        print("Clean count: " + str(self.numberOfClean))
+        print("Swap count: " + str(self.swap_count))
+        print("Swap at full count: " + str(self.swap_full))
+        print("Swap at idle count: " + str(self.swap_idle))
+        if self.clean_idle > 0:
+            print("Clean at idle count: " + str(self.clean_idle))
+            print("Averages dirty bands per clean at idle: " + str(float(self.idle_dirty_bands) / self.clean_idle))
+        if self.timed_checkpoints > 0:
+            print("Timed checkpoint count: " + str(self.timed_checkpoints))
+            print("Averages dirty bands per timed checkpoint: " + str(float(self.checkpoint_dirty_bands) / self.timed_checkpoints))
+        print("Total writes to persistent cache: " + str(self.writesPutInPCache))
+        print("Total read to disk: " + str(self.totalRead))
+        print("Total sectors to persistent cache: " + str(self.sectorsPutInPCache))
+        if self.numberOfClean > 0:
+            print("Averages dirty bands per clean: " + str(float(self.totalDirtyBands) / self.numberOfClean))
+        if self.checkpoint:
+            print("Total dirty bands on checkpoint: " + str(self.totalDirtyBands))
+        if self.live_index is not None:
+            self.printLiveSummary()
+        print("--------------------------------------")
+
+    def summary(self):
+        result = MultiLogSMR.summary(self)
+        result.update({
+            "swap_count": self.swap_count,
+            "swap_full": self.swap_full,
+            "swap_idle": self.swap_idle,
+            "clean_idle": self.clean_idle,
+            "timed_checkpoints": self.timed_checkpoints,
+            "idle_dirty_bands": self.idle_dirty_bands,
+            "checkpoint_dirty_bands": self.checkpoint_dirty_bands,
+        })
+        return result
+
+    # --------End of User Messages--------
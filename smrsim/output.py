@@ -0,0 +1,455 @@
+#!/usr/bin/env python
+#title           :output.py
+#description     :Buffered writers for the output traces, text, binary columnar or memory-mapped records
+#==============================================================================
+
+# coding: utf-8
+
+import atexit
+import json
+import mmap
+import multiprocessing
+import os
+import struct
+import weakref
+from array import array
+from itertools import starmap
+
+import numpy as np
+
+from smrsim.accel import kernels
+from smrsim.compress import isCompressed, openText
+
+# Text output keeps the trace format, with "IO-n"/"CC-n"/"LS-n" prefixes when ids is set, and
+# goes through a FILE_BUFFER sized file buffer.
+# Binary output is columnar: one np.save of the column names, then per block of BLOCK_ROWS
+# requests one np.save per column. Writers still open at exit are closed then, so the buffered block
+# reaches the file when a script stops without closing its outputs, as the plain files did.
+# Cleans and reboots emit many requests at once, writeBands and writeExtents take them in bulk.
+# Batched simulation formats the requests of a chunk ahead with prepareRows, then writes them a run at a
+# time with writePrepared, in between the other output
+# Mapped output (.rec) is one fixed-width record per request (the fields of the binary columns, time and
+# devno NUL padded to TIME_WIDTH and DEVNO_WIDTH) in a memory-mapped file grown MAPPED_EXTENT bytes at a
+# time and cut to its records on close, on an error too. A MAPPED_HEADER bytes header holds a magic, the
+# record count as of the last flush or extent and the json layout. writeTextRecords turns it into text on
+# every core, JOB_ROWS at a time
+BINARY_OUTPUT_EXT = ".cols"
+MAPPED_OUTPUT_EXT = ".rec"
+OUTPUT_EXTS = {"text": ".txt", "binary": BINARY_OUTPUT_EXT, "mapped": MAPPED_OUTPUT_EXT} #by -o/--output-format
+BLOCK_ROWS = 1 << 16
+FILE_BUFFER = 1 << 20
+MAPPED_MAGIC = b"SMRREC1\n"
+MAPPED_HEADER = 4096
+MAPPED_EXTENT = 1 << 27
+KIND_WIDTH = 4
+TIME_WIDTH = 24
+DEVNO_WIDTH = 8
+JOB_ROWS = 1 << 20
+OPEN_WRITERS = weakref.WeakSet() #writers of openOutput not closed yet, closed at exit
+
+TEXT_ID_FORMAT = "{}-{} {} {} {} {} {}\n"
+
+def isBinaryOutput(path):
+    return str(path).endswith(BINARY_OUTPUT_EXT)
+
+def isMappedOutput(path):
+    return str(path).endswith(MAPPED_OUTPUT_EXT)
+
+def recordDtype(ids, time_width = TIME_WIDTH, devno_width = DEVNO_WIDTH, kind_width = KIND_WIDTH): #packed record of a mapped output
+    return np.dtype(([("kind", "S%d" % kind_width), ("id", "<i8")] if ids else []) +
+                    [("time", "S%d" % time_width), ("devno", "S%d" % devno_width), ("blkno", "<i8"), ("blkcount", "<i4"), ("flag", "u1")])
+
+class TraceWriter(object):
+    def __init__(self, f, ids = False, binary = False, block_rows = BLOCK_ROWS):
+        self.f = f
+        self.ids = ids
+        self.binary = binary
+        self.block_rows = block_rows
+        self.rows = [] #binary only, (kind, id, time, devno, blkno, blkcount, flag) of single writes
+        self.columns = tuple([] for _ in range(7)) #binary only, same fields as rows, the next block
+        self.header_written = False
+
+        # text lines are formatted straight into the file buffer, a row buffer only costs more there
+        if not binary:
+            self.write = self.writeText
+            self.writeId = self.writeIdText
+
+    def write(self, time, devno, blkno, blkcount, flag):
+        self.rows.append(("", 0, time, devno, blkno, blkcount, flag))
+        if len(self.rows) >= self.block_rows:
+            self.flush()
+
+    def writeId(self, kind, idx, time, devno, blkno, blkcount, flag): #line prefixed by "kind-idx"
+        self.rows.append((kind, idx, time, devno, blkno, blkcount, flag))
+        if len(self.rows) >= self.block_rows:
+            self.flush()
+
+    def writeText(self, time, devno, blkno, blkcount, flag):
+        self.f.write("{} {} {} {} {}\n".format(time, devno, blkno, blkcount, flag))
+
+    def writeIdText(self, kind, idx, time, devno, blkno, blkcount, flag):
+        self.f.write("{}-{} {} {} {} {} {}\n".format(kind, idx, time, devno, blkno, blkcount, flag))
+
+    def writeBands(self, time, devno, starts, blkcount, kind = "", first_id = 0):
+        # read then write of blkcount sectors at every start (list or array), ids count up from first_id (one per start)
+        for i in range(0, len(starts), self.block_rows):
+            self.writeBandBlock(time, devno, asList(starts[i:i + self.block_rows]), blkcount, kind, first_id + i)
+
+    def writeBandBlock(self, time, devno, starts, blkcount, kind, first_id):
+        n = len(starts)
+        if self.binary:
+            ids = list(range(first_id, first_id + n))
+            self.addColumns([kind] * (2 * n), doubled(ids), [time] * (2 * n), [devno] * (2 * n), doubled(starts), [blkcount] * (2 * n), [1, 0] * n)
+            return
+        pre = "{} {} ".format(time, devno)
+        read = " {} 1\n".format(blkcount)
+        write = " {} 0\n".format(blkcount)
+        if self.ids:
+            ids = ["{}-{} ".format(kind, idx) for idx in range(first_id, first_id + n)]
+            self.f.write("".join([idx + pre + start + read + idx + pre + start + write for idx, start in zip(ids, map(str, starts))]))
+        else:
+            self.f.write("".join([pre + start + read + pre + start + write for start in map(str, starts)]))
+
+    def writeExtents(self, time, devno, blknos, blkcounts, flag): #one line per extent, blknos and blkcounts lists or arrays
+        for i in range(0, len(blknos), self.block_rows):
+            self.writeExtentBlock(time, devno, asList(blknos[i:i + self.block_rows]), asList(blkcounts[i:i + self.block_rows]), flag)
+
+    def writeExtentBlock(self, time, devno, blknos, blkcounts, flag):
+        n = len(blknos)
+        if self.binary:
+            self.addColumns([""] * n, [0] * n, [time] * n, [devno] * n, blknos, blkcounts, [flag] * n)
+            return
+        pre = "{} {} ".format(time, devno)
+        post = " {}\n".format(flag)
+        self.f.write("".join([pre + blkno + " " + blkcount + post for blkno, blkcount in zip(map(str, blknos), map(str, blkcounts))]))
+
+    def prepareRows(self, times, devnos, blknos, blkcounts, flags, kind = "", ids = None):
+        # rows of lists of fields to write later with writePrepared, "kind-id" prefixed when ids is given
+        n = len(times)
+        if self.binary:
+            return list(zip([kind] * n, ids if ids is not None else [0] * n, times, devnos, blknos, blkcounts, flags))
+        if ids is not None:
+            return list(map(TEXT_ID_FORMAT.format, [kind] * n, ids, times, devnos, blknos, blkcounts, flags))
+        return list(map("{} {} {} {} {}\n".format, times, devnos, blknos, blkcounts, flags))
+
+    def writePrepared(self, rows, start, stop): #rows start to stop of prepareRows
+        if start >= stop:
+            return
+        if self.binary: #through the single writes buffer, the blocks are the ones of as many write calls
+            while start < stop:
+                end = min(stop, start + self.block_rows - len(self.rows))
+                self.rows.extend(rows[start:end])
+                start = end
+                if len(self.rows) >= self.block_rows:
+                    self.flush()
+        else:
+            self.f.write("".join(rows[start:stop]))
+
+    def writeArrays(self, times, devnos, blknos, blkcounts, flags):
+        # rows of numpy columns, as as many write calls: times and devnos byte strings, blknos and blkcounts int64
+        if kernels is not None and not self.binary:
+            self.f.write(kernels.formatRows(np.ascontiguousarray(times), times.dtype.itemsize, np.ascontiguousarray(devnos), devnos.dtype.itemsize,
+                                            np.ascontiguousarray(blknos, dtype=np.int64), np.ascontiguousarray(blkcounts, dtype=np.int64),
+                                            np.ascontiguousarray(flags, dtype=np.uint8)))
+            return
+        rows = self.prepareRows(times.tolist(), devnos.tolist(), blknos.tolist(), blkcounts.tolist(), flags.tolist())
+        self.writePrepared(rows, 0, len(times))
+
+    def writeRows(self): #binary, move the buffered single writes to the next block
+        rows = self.rows
+        if not rows:
+            return
+        self.rows = []
+        self.addColumns(*zip(*rows))
+
+    def addColumns(self, *values): #binary, extend the next block, written once it holds block_rows
+        self.writeRows()
+        for column, value in zip(self.columns, values):
+            column.extend(value)
+        if len(self.columns[2]) >= self.block_rows:
+            self.writeBlock()
+
+    def writeBlock(self): #binary, one np.save per column
+        kind, ids, time, devno, blkno, blkcount, flag = self.columns
+        if not time:
+            return
+        self.columns = tuple([] for _ in range(7))
+        f = self.f
+        if not self.header_written:
+            np.save(f, np.array((["kind", "id"] if self.ids else []) + ["time", "devno", "blkno", "blkcount", "flag"]))
+            self.header_written = True
+        if self.ids:
+            np.save(f, fixedWidth(kind))
+            np.save(f, np.frombuffer(array('l', ids), dtype=np.int64))
+        np.save(f, fixedWidth(time))
+        np.save(f, fixedWidth(devno))
+        np.save(f, np.frombuffer(array('l', blkno), dtype=np.int64))
+        np.save(f, np.frombuffer(array('i', blkcount), dtype=np.int32))
+        np.save(f, np.frombuffer(bytearray(flag), dtype=np.uint8))
+
+    def tell(self): #output size so far, flushed
+        return self.f.tell()
+
+    def flush(self): #write out everything buffered
+        if self.binary:
+            self.writeRows()
+            self.writeBlock()
+        else:
+            self.f.flush()
+
+    def close(self):
+        OPEN_WRITERS.discard(self)
+        self.flush()
+        self.f.close()
+
+class MappedWriter(TraceWriter):
+    # single writes are buffered as in binary output and move to the records block_rows at a time or
+    # before the next bulk output, bulk output goes straight to the records
+    def __init__(self, path, ids = False, size = None, block_rows = BLOCK_ROWS):
+        TraceWriter.__init__(self, None, ids, True, block_rows)
+        self.dtype = recordDtype(ids)
+        self.widths = dict((name, self.dtype[name].itemsize) for name in ("kind", "time", "devno") if name in self.dtype.names)
+        self.map = self.records = None
+        if size is None or not os.path.exists(path):
+            self.f = open(path, "w+b")
+            self.count = 0
+        else: #go on from size bytes
+            if os.path.getsize(path) < size:
+                raise ValueError("%s is shorter than the %d bytes it had at the snapshot" % (path, size))
+            if readRecordHeader(path)[1] != self.dtype:
+                raise ValueError("%s has other records than this output" % path)
+            self.f = open(path, "r+b")
+            self.count = (size - MAPPED_HEADER) // self.dtype.itemsize
+        self.mapRecords(self.count + MAPPED_EXTENT // self.dtype.itemsize)
+        self.map[:MAPPED_HEADER] = recordHeader(self.dtype, self.count)
+
+    def mapRecords(self, capacity): #file sized for capacity records, mapped
+        self.records = None
+        if self.map is not None: #count in the header at every extent, a killed run keeps its records up to there
+            self.map[:MAPPED_HEADER] = recordHeader(self.dtype, self.count)
+            self.map.close()
+        self.f.truncate(MAPPED_HEADER + capacity * self.dtype.itemsize)
+        self.map = mmap.mmap(self.f.fileno(), 0)
+        self.records = np.frombuffer(self.map, dtype=self.dtype, offset=MAPPED_HEADER)
+
+    def reserve(self, n): #the next n records, counted
+        if self.count + n > len(self.records):
+            self.mapRecords(self.count + max(n, MAPPED_EXTENT // self.dtype.itemsize))
+        records = self.records[self.count:self.count + n]
+        self.count += n
+        return records
+
+    def fit(self, name, values): #values of a string field, or one value for all, checked against the record width
+        width = self.widths[name]
+        if isinstance(values, np.ndarray):
+            if values.dtype.itemsize > width and (np.char.str_len(values) > width).any():
+                raise ValueError("%s wider than the %d bytes of a record, see output.%s_WIDTH" % (name, width, name.upper()))
+        elif len(values if isinstance(values, str) else max(values, key=len)) > width:
+            raise ValueError("%s wider than the %d bytes of a record, see output.%s_WIDTH" % (name, width, name.upper()))
+        return values
+
+    def putRecords(self, kind, ids, time, devno, blkno, blkcount, flag): #fields are sequences of one length, or single values
+        n = len(blkno)
+        records = self.reserve(n)
+        if self.ids:
+            records["kind"] = self.fit("kind", kind)
+            records["id"] = ids
+        records["time"] = self.fit("time", time)
+        records["devno"] = self.fit("devno", devno)
+        records["blkno"] = blkno
+        records["blkcount"] = blkcount
+        records["flag"] = flag
+
+    def writeRows(self): #buffered single writes to their records
+        rows = self.rows
+        if not rows:
+            return
+        self.rows = []
+        self.putRecords(*zip(*rows))
+
+    def addColumns(self, *values):
+        self.writeRows()
+        self.putRecords(*values)
+
+    def writeBandBlock(self, time, devno, starts, blkcount, kind, first_id):
+        self.writeRows()
+        n = len(starts)
+        ids = np.repeat(np.arange(first_id, first_id + n), 2) if self.ids else 0
+        self.putRecords(kind, ids, time, devno, np.repeat(starts, 2), blkcount, np.tile(np.array([1, 0], dtype=np.uint8), n))
+
+    def writeExtentBlock(self, time, devno, blknos, blkcounts, flag):
+        self.writeRows()
+        self.putRecords("", 0, time, devno, blknos, blkcounts, flag)
+
+    def writePrepared(self, rows, start, stop):
+        if start < stop:
+            self.writeRows()
+            self.putRecords(*zip(*rows[start:stop]))
+
+    def writeArrays(self, times, devnos, blknos, blkcounts, flags):
+        self.writeRows()
+        self.putRecords("", 0, times, devnos, blknos, blkcounts, flags)
+
+    def tell(self):
+        return MAPPED_HEADER + self.count * self.dtype.itemsize
+
+    def flush(self): #records of the buffered writes, count in the header
+        self.writeRows()
+        self.map[:MAPPED_HEADER] = recordHeader(self.dtype, self.count)
+
+    def close(self): #file cut to its records
+        OPEN_WRITERS.discard(self)
+        if self.f.closed:
+            return
+        self.flush()
+        self.records = None
+        self.map.close()
+        self.f.truncate(self.tell())
+        self.f.close()
+
+class NullWriter(TraceWriter): #drops the output, for runs that only want the summary
+    def __init__(self):
+        TraceWriter.__init__(self, None)
+        self.write = self.writeId = self.writeBands = self.writeExtents = self.prepareRows = self.writePrepared = self.writeArrays = self.discard
+
+    def discard(self, *args):
+        pass
+
+    def flush(self):
+        pass
+
+    def close(self):
+        pass
+
+def closeOpenWriters(): #the buffered block of a binary output, the end of a compressed one, would be lost at exit
+    for writer in list(OPEN_WRITERS):
+        writer.close()
+
+atexit.register(closeOpenWriters)
+
+def asList(values): #python ints of a list, array or numpy array
+    return values.tolist() if hasattr(values, "tolist") else list(values)
+
+def fixedWidth(strings): #byte string column as wide as its longest value
+    return np.array(strings, dtype="S%d" % max(1, max(map(len, strings))))
+
+def doubled(values): #every value twice in a row, for read/write pairs
+    pairs = [0] * (2 * len(values))
+    pairs[0::2] = values
+    pairs[1::2] = values
+    return pairs
+
+def asWriter(out, ids = False): #wrap a plain file, writers pass through
+    if out is None or isinstance(out, TraceWriter):
+        return out
+    return TraceWriter(out, ids)
+
+def openOutput(path, ids = False, size = None):
+    # binary columnar writer if path ends with .cols, mapped if .rec, text otherwise (compressed if .gz, .zst or .lz4)
+    # size: go on with an existing output cut back to size bytes (resumed runs, see smrsim.snapshot)
+    writer = newOutput(path, ids, size)
+    OPEN_WRITERS.add(writer)
+    return writer
+
+def newOutput(path, ids, size):
+    if isCompressed(path):
+        if size is not None and os.path.exists(path):
+            raise ValueError("%s is compressed, it cannot be cut back to the snapshot" % path)
+        return TraceWriter(openText(path, "w"), ids)
+    if isMappedOutput(path):
+        return MappedWriter(path, ids, size)
+    binary = isBinaryOutput(path)
+    if size is None or not os.path.exists(path):
+        return TraceWriter(open(path, "wb" if binary else "w", FILE_BUFFER), ids, binary)
+    if os.path.getsize(path) < size:
+        raise ValueError("%s is shorter than the %d bytes it had at the snapshot" % (path, size))
+    f = open(path, "r+b" if binary else "r+", FILE_BUFFER)
+    f.truncate(size)
+    f.seek(size)
+    writer = TraceWriter(f, ids, binary)
+    writer.header_written = size > 0
+    return writer
+
+def closeOutputs(outputs): #close every writer (None skipped), all of them even when one fails, the first error raised after
+    error = None
+    for out in outputs:
+        if out is None:
+            continue
+        try:
+            out.close()
+        except Exception as e:
+            error = error or e
+    if error is not None:
+        raise error
+
+def recordHeader(dtype, count): #header of a mapped output of count records
+    layout = json.dumps({"ids": "id" in dtype.names, "kind_width": dtype["kind"].itemsize if "id" in dtype.names else KIND_WIDTH,
+                         "time_width": dtype["time"].itemsize, "devno_width": dtype["devno"].itemsize}, sort_keys=True)
+    header = MAPPED_MAGIC + struct.pack("<q", count) + layout.encode("ascii")
+    return header + b"\0" * (MAPPED_HEADER - len(header))
+
+def readRecordHeader(path): #record count and dtype of a mapped output
+    with open(path, "rb") as f:
+        header = f.read(MAPPED_HEADER)
+    if len(header) < MAPPED_HEADER or not header.startswith(MAPPED_MAGIC):
+        raise ValueError("%s is not a mapped output" % path)
+    count = struct.unpack("<q", header[len(MAPPED_MAGIC):len(MAPPED_MAGIC) + 8])[0]
+    layout = json.loads(header[len(MAPPED_MAGIC) + 8:].rstrip(b"\0").decode("ascii"))
+    return count, recordDtype(layout["ids"], layout["time_width"], layout["devno_width"], layout["kind_width"])
+
+def readRecords(path): #records of a mapped output, memory-mapped read only
+    count, dtype = readRecordHeader(path)
+    count = min(count, (os.path.getsize(path) - MAPPED_HEADER) // dtype.itemsize)
+    if count == 0:
+        return np.empty(0, dtype=dtype)
+    return np.memmap(path, dtype=dtype, mode="r", offset=MAPPED_HEADER, shape=(count,))
+
+def recordText(records): #text lines of records
+    if kernels is not None and "id" not in records.dtype.names:
+        return kernels.formatRows(np.ascontiguousarray(records["time"]), records.dtype["time"].itemsize,
+                                  np.ascontiguousarray(records["devno"]), records.dtype["devno"].itemsize,
+                                  records["blkno"].astype(np.int64), records["blkcount"].astype(np.int64), np.ascontiguousarray(records["flag"]))
+    fmt = TEXT_ID_FORMAT if "id" in records.dtype.names else "{} {} {} {} {}\n"
+    return "".join(starmap(fmt.format, records.tolist()))
+
+def formatRecords(job): #worker: text of the records start to stop of a mapped output
+    path, start, stop = job
+    return recordText(readRecords(path)[start:stop])
+
+def writeTextRecords(f, path, processes = None, job_rows = JOB_ROWS): #text form of a mapped output, formatted on processes workers
+    count = len(readRecords(path))
+    jobs = [(path, start, min(count, start + job_rows)) for start in range(0, count, job_rows)]
+    if processes == 1 or len(jobs) < 2:
+        for job in jobs:
+            f.write(formatRecords(job))
+        return
+    pool = multiprocessing.Pool(processes)
+    try:
+        for text in pool.imap(formatRecords, jobs): #in order, the workers format the next jobs meanwhile
+            f.write(text)
+    finally:
+        pool.close()
+        pool.join()
+
+def readOutputBlocks(path): #structured arrays of a binary or mapped output, one per block
+    if isMappedOutput(path):
+        records = readRecords(path)
+        for start in range(0, len(records), BLOCK_ROWS):
+            yield records[start:start + BLOCK_ROWS]
+        return
+    with open(path, "rb") as f:
+        size = os.fstat(f.fileno()).st_size
+        if size == 0:
+            return
+        names = [str(name) for name in np.load(f).tolist()]
+        while f.tell() < size:
+            columns = [np.load(f) for _ in names]
+            block = np.empty(len(columns[0]), dtype=[(name, column.dtype) for name, column in zip(names, columns)])
+            for name, column in zip(names, columns):
+                block[name] = column
+            yield block
+
+def writeTextOutput(f, blocks): #text form of a binary output
+    for block in blocks:
+        fmt = TEXT_ID_FORMAT if "id" in block.dtype.names else "{} {} {} {} {}\n"
+        f.write("".join(starmap(fmt.format, block.tolist())))
@@ -0,0 +1,38 @@
+#!/usr/bin/env python
+#title           :scheduler.py
+#description     :Time ordered background tasks of a simulator, run between the trace requests
+#==============================================================================
+
+# coding: utf-8
+
+import heapq
+
+class Scheduler(object):
+    # Pending tasks as a heap of (time, seq, name, args), name being a method of the owner called as
+    # owner.name(time, *args). Tasks of the same time run in the order they were scheduled, a task may
+    # schedule others. Names rather than bound methods keep the pending tasks plain data (snapshots)
+    def __init__(self, owner):
+        self.owner = owner
+        self.heap = []
+        self.seq = 0
+
+    def schedule(self, time, name, *args):
+        heapq.heappush(self.heap, (time, self.seq, name, args))
+        self.seq += 1
+
+    def runUntil(self, now): #run every task due at or before now, in time order
+        heap = self.heap
+        while heap and heap[0][0] <= now:
+            time, _, name, args = heapq.heappop(heap)
+            getattr(self.owner, name)(time, *args)
+
+    def __len__(self):
+        return len(self.heap)
+
+    def getState(self): #pending tasks, json friendly
+        return {"seq": self.seq, "tasks": [[time, seq, name, list(args)] for time, seq, name, args in self.heap]}
+
+    def setState(self, state):
+        self.seq = state["seq"]
+        self.heap = [(time, seq, str(name), tuple(args)) for time, seq, name, args in state["tasks"]]
+        heapq.heapify(self.heap)
@@ -0,0 +1,185 @@
+#!/usr/bin/env python
+#title           :shard.py
+#description     :Simulate every device of a multi disk trace as its own disk, in one process or one per device
+#==============================================================================
+
+# coding: utf-8
+
+import multiprocessing
+import numbers
+import os
+import sys
+import time
+import traceback
+from itertools import islice
+
+import numpy as np
+
+from smrsim.multilog import MultiLogSMR
+from smrsim.oracle import OracleSMR
+from smrsim.output import NullWriter, closeOutputs, openOutput
+from smrsim.singlelog import SingleLogSMR
+from smrsim.trace import CHUNK_LINES, loadBinaryTrace, readBinaryChunks
+
+# Every devno of a trace gets its own simulator of the same configuration: its own logs, last tail and
+# counters. In one process ShardedSMR routes the events of each chunk to their device's simulator, the
+# trace is read once (runInProcess, for few cores or devices too small to pay for a process each). With
+# runShards every device is a worker process of its own, reading the memory-mapped binary trace and
+# keeping the events of its device (a numpy mask per chunk), so devices scale with the cores.
+# mergeSummaries adds the summaries of the devices up into the one of the whole array
+SIMULATORS = {"multilog": MultiLogSMR, "oracle": OracleSMR, "singlelog": SingleLogSMR}
+OUTPUTS = ["result", "result_cleanup", "result_read", "read_reboot", "write_reboot"] #constructor order
+
+def makeSimulator(simulator, config, writers, ids = False): #writers: output writers in OUTPUTS order, None for none
+    if simulator == "singlelog":
+        return SingleLogSMR(config, writers[0], writers[1], ids)
+    if simulator == "multilog":
+        return MultiLogSMR(config, writers[0], writers[1])
+    return OracleSMR(config, *writers)
+
+def outputIds(simulator, name, ids): #whether an output of a simulator has IO-/CC- ids, as in the simulator scripts
+    if simulator == "oracle":
+        return name == "result"
+    return ids and simulator == "singlelog"
+
+def traceDevices(trace): #sorted devnos of a binary trace
+    return sorted(np.unique(loadBinaryTrace(trace)["devno"]).tolist())
+
+class ShardedSMR(object):
+    # same interface as one simulator (run, feed, finish, flushOutput, summary), factory(devno) builds the
+    # simulator of a device on its first event. A device whose simulator raises is not fed any more, its
+    # error is kept and the other devices go on
+    def __init__(self, factory):
+        self.factory = factory
+        self.sims = {} #devno: simulator
+        self.errors = {} #devno: last line of the traceback
+        self.seconds = {} #devno: time spent in its simulator
+
+    def run(self, events):
+        events = iter(events)
+        while True:
+            chunk = list(islice(events, CHUNK_LINES))
+            if not chunk:
+                break
+            self.feed(chunk)
+        self.finish()
+        self.flushOutput()
+
+    def feed(self, events): #every device takes its events of the chunk in turn, in trace order
+        shards = {}
+        for event in events:
+            shard = shards.get(event[1])
+            if shard is None:
+                shard = shards[event[1]] = []
+            shard.append(event)
+        for devno, shard in shards.items():
+            self.call(devno, "feed", shard)
+
+    def call(self, devno, method, *args): #method of the simulator of a device, timed, errors kept
+        if devno in self.errors:
+            return
+        start = time.time()
+        try:
+            if devno not in self.sims:
+                self.sims[devno] = self.factory(devno)
+            getattr(self.sims[devno], method)(*args)
+        except Exception:
+            self.errors[devno] = traceback.format_exc().strip().split("\n")[-1]
+        self.seconds[devno] = self.seconds.get(devno, 0) + time.time() - start
+
+    def finish(self):
+        for devno in list(self.sims):
+            self.call(devno, "finish")
+
+    def flushOutput(self):
+        for sim in self.sims.values():
+            sim.flushOutput()
+
+    def summary(self): #summary of every device
+        return dict((devno, sim.summary()) for devno, sim in self.sims.items())
+
+def deviceEvents(trace, devno, chunk_lines = CHUNK_LINES): #events of one device of a binary trace
+    for chunk in readBinaryChunks(trace, chunk_lines):
+        for event in chunk[chunk["devno"] == devno].tolist():
+            yield event
+
+def openWriters(simulator, config, outputs, ids): #output writers of a device in OUTPUTS order, outputs: its paths
+    writers = [openOutput(path, outputIds(simulator, name, ids)) if path else None for name, path in zip(OUTPUTS, outputs)]
+    for idx, name in enumerate(OUTPUTS): #outputs the simulator always writes to are discarded when not kept
+        if writers[idx] is None and (name == "result" or (config.reboot and name in ("read_reboot", "write_reboot"))):
+            writers[idx] = NullWriter()
+    return writers
+
+def runDevice(job): #worker: simulate one device, returns its row of the result table
+    devno, trace, simulator, config, outputs, ids = job
+    sys.stdout = open(os.devnull, "w") #reboot reports of the devices would interleave, their figures are in the rows
+    row = {"devno": devno}
+    start = time.time()
+    try:
+        writers = openWriters(simulator, config, outputs, ids)
+        try:
+            sim = makeSimulator(simulator, config, writers, ids)
+            sim.run(deviceEvents(trace, devno))
+        finally: #what was simulated stays in the outputs of a failed device
+            closeOutputs(writers)
+        row.update(sim.summary())
+        row["error"] = None
+    except Exception:
+        row["error"] = traceback.format_exc().strip().split("\n")[-1]
+    row["seconds"] = round(time.time() - start, 3)
+    return row
+
+def traceEvents(trace, chunk_lines = CHUNK_LINES): #every event of a binary trace
+    for chunk in readBinaryChunks(trace, chunk_lines):
+        for event in chunk.tolist():
+            yield event
+
+def runInProcess(trace, devices, simulator, config, outputs = None, ids = False):
+    # runShards without workers: one ShardedSMR reads the trace once and feeds every device in turn
+    paths = dict((devno, outputs[idx] if outputs else [None] * len(OUTPUTS)) for idx, devno in enumerate(devices))
+    writers = {}
+    def factory(devno):
+        writers[devno] = openWriters(simulator, config, paths[devno], ids)
+        return makeSimulator(simulator, config, writers[devno], ids)
+    sharded = ShardedSMR(factory)
+    stdout, sys.stdout = sys.stdout, open(os.devnull, "w") #as in the workers, no reboot reports
+    try:
+        sharded.run(traceEvents(trace))
+    finally:
+        sys.stdout = stdout
+    rows = []
+    for devno in devices:
+        row = {"devno": devno}
+        try:
+            if devno in writers:
+                closeOutputs(writers[devno])
+        except Exception:
+            sharded.errors.setdefault(devno, traceback.format_exc().strip().split("\n")[-1])
+        if devno not in sharded.errors and devno in sharded.sims:
+            row.update(sharded.sims[devno].summary())
+        row["error"] = sharded.errors.get(devno)
+        row["seconds"] = round(sharded.seconds.get(devno, 0), 3)
+        rows.append(row)
+    return rows
+
+def runShards(trace, devices, simulator, config, outputs = None, ids = False, processes = None):
+    # rows in devices order, trace: binary trace, outputs: per device, output paths in OUTPUTS order (None for none)
+    jobs = [(devno, trace, simulator, config, outputs[idx] if outputs else [None] * len(OUTPUTS), ids)
+            for idx, devno in enumerate(devices)]
+    pool = multiprocessing.Pool(processes)
+    try:
+        rows = dict((row["devno"], row) for row in pool.imap_unordered(runDevice, jobs))
+    finally:
+        pool.close()
+        pool.join()
+    return [rows[devno] for devno in devices]
+
+def mergeSummaries(rows): #summary of the whole array: counts added up, averages recomputed
+    total = {}
+    for row in rows:
+        for key, value in row.items():
+            if key not in ("devno", "seconds") and isinstance(value, numbers.Integral) and not isinstance(value, bool):
+                total[key] = total.get(key, 0) + value
+    if total.get("clean_count"):
+        total["avg_dirty_bands_per_clean"] = float(total["total_dirty_bands"]) / total["clean_count"]
+    return total
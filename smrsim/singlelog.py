@@ -0,0 +1,168 @@
+#!/usr/bin/env python
+#title           :singlelog.py
+#description     :Simulate smr disk with a single persistent cache
+#==============================================================================
+
+# coding: utf-8
+
+from array import array
+
+import numpy as np
+
+from smrsim.config import SECTOR_SIZE
+from smrsim.errors import HaltException
+from smrsim.output import asWriter
+from smrsim.trace import READ
+
+class SingleLogSMR(object):
+    STATE = ["current_pcache_idx", "numberOfClean", "writesPutInPCache", "sectorsPutInPCache", "totalDirtyBands", "totalRead",
+             "io_id", "cc_id"] #scalars of a snapshot, see getState
+
+    # ids: prefix every output line with its IO-/CC- id (smr_singlepcache_id.py)
+    def __init__(self, config, result, result_cleanup = None, ids = False):
+        self.config = config
+        self.noclean = config.noclean
+        self.ids = ids
+
+        self.PCACHE_SIZE = config.pcsize // SECTOR_SIZE #pcache is tantamount to persistent_cache, default 100GB-107374182400
+        self.BAND_SIZE = config.bandsize // SECTOR_SIZE #default 10MB-10485760
+
+        # Disk element
+        self.current_pcache_idx = 0
+        self.pcache_map = array('l') #blkno,blkcount pairs
+
+        # Output file, plain files are wrapped in a buffered TraceWriter
+        self.result = asWriter(result, ids)
+        self.result_cleanup = asWriter(result_cleanup, ids)
+
+        # Monitoring variables
+        self.numberOfClean = 0
+        self.writesPutInPCache = 0
+        self.sectorsPutInPCache = 0
+        self.totalDirtyBands = 0
+        self.totalRead = 0
+
+        self.io_id = 0
+        self.cc_id = 0
+
+    def writeIO(self, time, devno, blkno, blkcount, flag):
+        if self.ids:
+            self.result.writeId("IO", self.io_id, time, devno, blkno, blkcount, flag)
+        else:
+            self.result.write(time, devno, blkno, blkcount, flag)
+        self.io_id += 1
+
+    def loggedExtents(self): #extents held by the persistent cache
+        return len(self.pcache_map) // 2
+
+    def getState(self): #(scalars, arrays) to resume the simulation from, see smrsim.snapshot
+        cached = np.frombuffer(self.pcache_map, dtype='l') if len(self.pcache_map) > 0 else np.zeros(0, dtype='l')
+        return dict((name, getattr(self, name)) for name in self.STATE), {"pcache_map": cached}
+
+    def setState(self, scalars, arrays): #state of getState, on a simulator that has not simulated anything yet
+        for name in self.STATE:
+            setattr(self, name, scalars[name])
+        self.pcache_map = array('l', arrays["pcache_map"].tolist())
+
+    def clearPCache(self):
+        self.current_pcache_idx = 0
+        del self.pcache_map[:]
+
+    def cleanPCache(self, time, devno):
+        BAND_SIZE = self.BAND_SIZE
+        dirty_band = set()
+
+        #METRICS part - increment number of clean
+        self.numberOfClean += 1
+
+        for blkno, blkcount in zip(self.pcache_map[0::2], self.pcache_map[1::2]):
+            starting_band = blkno // BAND_SIZE
+            band_count = (blkcount + (blkno % BAND_SIZE) + BAND_SIZE - 1) // BAND_SIZE #ceil
+            for i in range(starting_band, starting_band + band_count):
+                dirty_band.add(i)
+                #METRICS part - total dirty band, used for average dirty bands per clean
+                self.totalDirtyBands += 1
+
+        #read then write of every dirty band, one CC id per band
+        out = self.result if self.result_cleanup is None else self.result_cleanup
+        out.writeBands(time, devno, [band * BAND_SIZE + self.PCACHE_SIZE for band in sorted(dirty_band)], BAND_SIZE, "CC", self.cc_id)
+        self.cc_id += len(dirty_band)
+
+        #clear pcache
+        self.clearPCache()
+
+    def handleRead(self, time, devno, blkno, blkcount):
+        self.writeIO(time, devno, blkno + self.PCACHE_SIZE, blkcount, 1)
+        #METRICS part - read to disk
+        self.totalRead += 1
+
+    def handleWrite(self, time, devno, blkno, blkcount):
+        #TODO: might need to create better handling for over-limit case
+        if (self.current_pcache_idx + blkcount > self.PCACHE_SIZE):
+            raise HaltException("write size is larger than persistent cache limit! script terminated")
+
+        #write to persistent cache
+        self.writeIO(time, devno, self.current_pcache_idx, blkcount, 0)
+        #METRICS part - writes and sectors put in persistent cache
+        self.writesPutInPCache += 1
+        self.sectorsPutInPCache += blkcount
+        #create map
+        self.pcache_map.extend((blkno, blkcount))
+        #increment persistent cache idx
+        self.current_pcache_idx += blkcount
+
+        if (self.current_pcache_idx >= 0.9 * self.PCACHE_SIZE):
+            if self.noclean:
+                self.clearPCache()
+            else:
+                self.cleanPCache(time, devno)
+
+    def handleEvent(self, time, devno, blkno, blkcount, flag):
+        if flag == READ: #read
+            self.handleRead(time, devno, blkno, blkcount)
+        else: #write
+            self.handleWrite(time, devno, blkno, blkcount)
+
+    def run(self, events): #simulate a whole trace, see smrsim.trace for the event format
+        self.feed(events)
+        self.finish()
+        self.flushOutput()
+
+    def feed(self, events): #simulate the next events of the trace
+        handleEvent = self.handleEvent
+        for time, devno, blkno, blkcount, flag in events:
+            handleEvent(time, devno, blkno, blkcount, flag)
+
+    def finish(self): #end of trace
+        pass
+
+    def flushOutput(self): #write out what the output writers still buffer
+        for out in (self.result, self.result_cleanup):
+            if out is not None:
+                out.flush()
+
+    def printConfiguration(self):
+        print("------------Configuration------------")
+        print("Persistent cache size: " + str(self.PCACHE_SIZE * SECTOR_SIZE // 1048576) + " MB")
+        print("Band size: " + str(self.BAND_SIZE * SECTOR_SIZE // 1048576) + " MB")
+        print("-------------------------------------")
+
+    def printSummary(self):
+        print("------------Result Summary------------")
+        print("Number of clean: " + str(self.numberOfClean))
+        print("Total writes to persistent cache: " + str(self.writesPutInPCache))
+        print("Total read to disk: " + str(self.totalRead))
+        print("Total sectors to persistent cache: " + str(self.sectorsPutInPCache))
+        if self.numberOfClean > 0:
+            print("Averages dirty bands per clean: " + str(float(self.totalDirtyBands) / self.numberOfClean))
+        print("--------------------------------------")
+
+    def summary(self): #figures of printSummary, for sweeps and scripts
+        return {
+            "clean_count": self.numberOfClean,
+            "writes_to_pcache": self.writesPutInPCache,
+            "reads_to_disk": self.totalRead,
+            "sectors_to_pcache": self.sectorsPutInPCache,
+            "total_dirty_bands": self.totalDirtyBands,
+            "avg_dirty_bands_per_clean": float(self.totalDirtyBands) / self.numberOfClean if self.numberOfClean > 0 else None,
+        }
@@ -0,0 +1,68 @@
+#!/usr/bin/env python
+#title           :snapshot.py
+#description     :Save the simulator state every n events and resume a run from it
+#==============================================================================
+
+# coding: utf-8
+
+import json
+import os
+
+import numpy as np
+
+from smrsim.instrument import OUTPUTS
+from smrsim.trace import CHUNK_LINES
+
+# A snapshot is one compressed .npz file: the state arrays of the simulator (getState) and a json "meta"
+# entry with its scalars, the configuration, the events simulated, the trace position (see TraceCursor)
+# and the size of every output file. Outputs are flushed on every snapshot, a resumed run cuts them back
+# to those sizes and appends to them (a missing output starts empty, e.g. a fork run in another directory).
+# Restoring a snapshot in a simulator of another policy forks the run from that point of the trace
+SNAPSHOT_FORMAT = 1
+
+def saveSnapshot(path, sim, events, position): #written aside then renamed, a crash keeps the previous snapshot
+    outputs = {}
+    for name in OUTPUTS:
+        out = getattr(sim, name, None)
+        if out is not None and out.f is not None:
+            out.flush()
+            outputs[name] = out.tell()
+    scalars, arrays = sim.getState()
+    meta = {"format": SNAPSHOT_FORMAT, "simulator": type(sim).__name__, "config": vars(sim.config), "state": scalars,
+            "events": events, "position": position, "outputs": outputs}
+    temp = path + ".tmp"
+    with open(temp, "wb") as f:
+        np.savez_compressed(f, meta=np.array(json.dumps(meta, sort_keys=True)), **arrays)
+    os.rename(temp, path)
+
+def loadSnapshot(path): #meta dict of a snapshot, its state arrays under "arrays"
+    with np.load(path) as data:
+        meta = json.loads(str(data["meta"]))
+        if meta.get("format") != SNAPSHOT_FORMAT:
+            raise ValueError("%s: unknown snapshot format %s" % (path, meta.get("format")))
+        meta["arrays"] = dict((name, data[name]) for name in data.files if name != "meta")
+    return meta
+
+def restoreSnapshot(sim, snapshot): #state of a loaded snapshot into a new simulator of the same kind
+    if type(sim).__name__ != snapshot["simulator"]:
+        raise ValueError("snapshot of a %s, not a %s" % (snapshot["simulator"], type(sim).__name__))
+    sim.setState(snapshot["state"], snapshot["arrays"])
+
+def runSnapshots(sim, cursor, path = None, every = 0, events = 0, progress = None):
+    # simulate the trace from cursor to its end, saving a snapshot to path every `every` events (none if 0),
+    # events: events simulated before the cursor position. Returns the events simulated in all
+    next_save = (events // every + 1) * every if path and every > 0 else None
+    while True:
+        chunk = cursor.read(CHUNK_LINES if next_save is None else min(CHUNK_LINES, next_save - events))
+        if not chunk:
+            break
+        sim.feed(chunk)
+        events += len(chunk)
+        if progress is not None:
+            progress.update(len(chunk))
+        if next_save is not None and events >= next_save:
+            saveSnapshot(path, sim, events, cursor.position)
+            next_save += every
+    sim.finish()
+    sim.flushOutput()
+    return events
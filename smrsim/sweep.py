@@ -0,0 +1,63 @@
+#!/usr/bin/env python
+#title           :sweep.py
+#description     :Run a grid of multi log configurations over one trace in a process pool
+#==============================================================================
+
+# coding: utf-8
+
+import itertools
+import multiprocessing
+import os
+import time
+import traceback
+
+from smrsim.config import Config
+from smrsim.multilog import MultiLogSMR
+from smrsim.output import NullWriter, openOutput
+from smrsim.trace import isBinaryTrace, readTrace, writeBinaryTrace
+
+# A grid maps config options to the list of values to try, e.g.
+#   {"logsize": [10485760, 20971520], "group": [104857600], "policy": ["A", "B"]}
+# every combination is one job, options left out keep the base config value
+SWEEP_ORDER = ["disksize", "group", "logsize", "bandsize", "policy", "noclean"]
+
+def gridConfigs(base, grid): #Config of every grid point, the first keys vary slowest
+    keys = [key for key in SWEEP_ORDER if key in grid] + sorted(key for key in grid if key not in SWEEP_ORDER)
+    return [base.replace(**dict(zip(keys, values))) for values in itertools.product(*[grid[key] for key in keys])]
+
+def binaryTrace(path, workdir): #binary (.npy) copy of the trace, memory-mapped and shared by every worker
+    if isBinaryTrace(path):
+        return path
+    binary = os.path.join(workdir, os.path.basename(path).split('.')[0] + ".npy")
+    if not os.path.exists(binary) or os.path.getmtime(binary) < os.path.getmtime(path):
+        writeBinaryTrace(binary, path)
+    return binary
+
+def runJob(job): #worker: simulate one config, returns its row of the result table
+    idx, trace, config, output = job
+    row = dict((key, getattr(config, key)) for key in SWEEP_ORDER)
+    row["job"] = idx
+    start = time.time()
+    try:
+        result = openOutput(output) if output else NullWriter()
+        try:
+            smr = MultiLogSMR(config, result)
+            smr.run(readTrace(trace))
+        finally: #what was simulated stays in the output of a failed job
+            result.close()
+        row.update(smr.summary())
+        row["error"] = None
+    except Exception:
+        row["error"] = traceback.format_exc().strip().split("\n")[-1]
+    row["seconds"] = round(time.time() - start, 3)
+    return row
+
+def runSweep(trace, configs, processes = None, outputs = None): #rows in config order, outputs: trace output path per config
+    jobs = [(idx, trace, config, outputs[idx] if outputs else None) for idx, config in enumerate(configs)]
+    pool = multiprocessing.Pool(processes)
+    try:
+        rows = list(pool.imap_unordered(runJob, jobs))
+    finally:
+        pool.close()
+        pool.join()
+    return sorted(rows, key=lambda row: row["job"])
@@ -0,0 +1,197 @@
+#!/usr/bin/env python
+#title           :trace.py
+#description     :Trace events for the simulators, text and binary trace files
+#==============================================================================
+
+# coding: utf-8
+
+from itertools import islice
+
+import numpy as np
+
+from smrsim.accel import kernels
+from smrsim.compress import StreamReader, isCompressed, openText
+
+# Notes: flags - write -> 0 ; read -> 1
+READ = 1
+WRITE = 0
+
+# An event is (time, devno, blkno, blkcount, flag). time and devno are kept as the
+# strings found in the trace since they are copied verbatim to the output traces
+
+# Traces are parsed in chunks into structured arrays with the fields of an event.
+# The binary trace is one such array saved as a .npy file, fixed-width records that
+# np.load can memory-map, so re-running a trace skips the text parsing entirely
+BINARY_EXT = ".npy"
+CHUNK_LINES = 1 << 18
+MAX_BLKCOUNT = (1 << 31) - 1 #blkcount is an int32 field
+
+def traceDtype(time_dtype, devno_dtype):
+    return np.dtype([("time", time_dtype), ("devno", devno_dtype), ("blkno", "<i8"), ("blkcount", "<i4"), ("flag", "u1")])
+
+def isBinaryTrace(path):
+    return str(path).endswith(BINARY_EXT)
+
+def splitChunk(lines): #tokens of a block of lines, five per line
+    tokens = "".join(lines).split()
+    # extra columns somewhere, or a short line making up for them: take the first five of each line
+    if len(tokens) != 5 * len(lines) or tokens[0::5] != [line.split(None, 1)[0] if line.strip() else None for line in lines]:
+        fields = [line.split()[:5] for line in lines]
+        for line, words in zip(lines, fields):
+            if len(words) < 5: #every later event would be shifted
+                raise ValueError("trace line with less than five fields: %r" % line)
+        tokens = [token for words in fields for token in words]
+    return tokens
+
+def parseChunk(lines): #structured array of "time devno blkno blkcount flag" lines
+    if kernels is not None:
+        try:
+            return kernelChunk("".join(lines))
+        except ValueError: #a line the kernel does not read, the python path decides what it is
+            pass
+    tokens = splitChunk(lines)
+    time = np.array(tokens[0::5])
+    devno = np.array(tokens[1::5])
+    chunk = np.empty(len(time), dtype=traceDtype(time.dtype, devno.dtype))
+    chunk["time"] = time
+    chunk["devno"] = devno
+    chunk["blkno"] = list(map(int, tokens[2::5]))
+    blkcount = list(map(int, tokens[3::5]))
+    if blkcount and (max(blkcount) > MAX_BLKCOUNT or min(blkcount) < -MAX_BLKCOUNT - 1):
+        idx = next(i for i, count in enumerate(blkcount) if not -MAX_BLKCOUNT - 1 <= count <= MAX_BLKCOUNT)
+        raise ValueError("blkcount wider than the int32 field: %r" % lines[idx])
+    chunk["blkcount"] = blkcount
+    chunk["flag"] = np.array(tokens[4::5]) == "1" #anything but 1 is a write
+    return chunk
+
+def kernelChunk(data): #parseChunk of a block of text by the compiled kernel
+    count, time_width, times, devno_width, devnos, blknos, blkcounts, flags = kernels.parseLines(data)
+    chunk = np.empty(count, dtype=traceDtype("S%d" % time_width, "S%d" % devno_width))
+    chunk["time"] = np.frombuffer(times, dtype="S%d" % time_width)
+    chunk["devno"] = np.frombuffer(devnos, dtype="S%d" % devno_width)
+    chunk["blkno"] = np.frombuffer(blknos, dtype=np.int64)
+    chunk["blkcount"] = np.frombuffer(blkcounts, dtype=np.int32)
+    chunk["flag"] = np.frombuffer(flags, dtype=np.uint8)
+    return chunk
+
+def openTrace(source): #lines of a text trace path or open file, a compressed one through its stream
+    name = getattr(source, "name", source)
+    if isinstance(source, str) or (isinstance(name, str) and isCompressed(name)):
+        return openText(name)
+    return source
+
+def readTextChunks(lines, chunk_lines = CHUNK_LINES):
+    lines = iter(lines)
+    while True:
+        block = list(islice(lines, chunk_lines))
+        if not block:
+            return
+        yield parseChunk(block)
+
+def parseEvents(lines): #event tuples of a block of lines
+    # same events as parseChunk, built straight from the tokens since the simulators consume python tuples
+    tokens = splitChunk(lines)
+    flags = [READ if flag == "1" else WRITE for flag in tokens[4::5]]
+    return zip(tokens[0::5], tokens[1::5], map(int, tokens[2::5]), map(int, tokens[3::5]), flags)
+
+def readTextEvents(lines, chunk_lines = CHUNK_LINES):
+    lines = iter(lines)
+    while True:
+        block = list(islice(lines, chunk_lines))
+        if not block:
+            return
+        for event in parseEvents(block):
+            yield event
+
+def loadBinaryTrace(path): #memory-mapped structured array
+    return np.load(path, mmap_mode="r")
+
+def readBinaryChunks(path, chunk_lines = CHUNK_LINES):
+    trace = loadBinaryTrace(path)
+    for start in range(0, len(trace), chunk_lines):
+        yield trace[start:start + chunk_lines]
+
+def readTraceChunks(source, chunk_lines = CHUNK_LINES): #source: trace path, open trace file or lines
+    name = getattr(source, "name", source)
+    if isinstance(name, str) and isBinaryTrace(name):
+        return readBinaryChunks(name, chunk_lines)
+    return readTextChunks(openTrace(source), chunk_lines)
+
+def chunkEvents(chunks): #event tuples of structured array chunks
+    for chunk in chunks:
+        for event in chunk.tolist():
+            yield event
+
+def eventChunk(events): #structured array of a list of event tuples, the inverse of chunkEvents
+    if not events:
+        return np.empty(0, dtype=traceDtype("S1", "S1"))
+    times, devnos, blknos, blkcounts, flags = zip(*events)
+    time = np.array(times)
+    devno = np.array(devnos)
+    chunk = np.empty(len(time), dtype=traceDtype(time.dtype, devno.dtype))
+    chunk["time"] = time
+    chunk["devno"] = devno
+    chunk["blkno"] = blknos
+    chunk["blkcount"] = blkcounts
+    chunk["flag"] = flags
+    return chunk
+
+def readTrace(source, chunk_lines = CHUNK_LINES): #events of a text or binary trace, see readTraceChunks
+    name = getattr(source, "name", source)
+    if isinstance(name, str) and isBinaryTrace(name):
+        for event in chunkEvents(readBinaryChunks(name, chunk_lines)):
+            yield event
+    else:
+        for event in readTextEvents(openTrace(source), chunk_lines):
+            yield event
+
+class TraceCursor(object):
+    # events of a trace from a position, a byte offset in a text trace or an event index in a binary one,
+    # so that a run can stop and later go on from the same event (smrsim.snapshot)
+    def __init__(self, source, position = 0):
+        name = getattr(source, "name", source)
+        self.binary = isinstance(name, str) and isBinaryTrace(name)
+        self.position = position
+        if self.binary:
+            self.trace = loadBinaryTrace(name)
+        else:
+            self.f = openTrace(source)
+            if position > 0 and isinstance(self.f, StreamReader): #no seek in a compressed trace, read up to position
+                self.f.skip(position)
+            elif position > 0:
+                self.f.seek(position)
+
+    def read(self, n): #list of the next n events at most, empty at the end of the trace
+        if self.binary:
+            events = self.trace[self.position:self.position + n].tolist()
+            self.position += len(events)
+            return events
+        lines = list(islice(self.f, n))
+        self.position += sum(map(len, lines))
+        return list(parseEvents(lines)) if lines else []
+
+def writeBinaryTrace(path, text_path, chunk_lines = CHUNK_LINES):
+    # the first pass finds the record count and the widest time and devno, the second fills the file
+    count = 0
+    time_dtype = devno_dtype = np.dtype("S1")
+    with openText(text_path) as f:
+        for chunk in readTextChunks(f, chunk_lines):
+            count += len(chunk)
+            if chunk.dtype["time"].itemsize > time_dtype.itemsize:
+                time_dtype = chunk.dtype["time"]
+            if chunk.dtype["devno"].itemsize > devno_dtype.itemsize:
+                devno_dtype = chunk.dtype["devno"]
+
+    trace = np.lib.format.open_memmap(path, mode="w+", dtype=traceDtype(time_dtype, devno_dtype), shape=(count,))
+    idx = 0
+    with openText(text_path) as f:
+        for chunk in readTextChunks(f, chunk_lines):
+            trace[idx:idx + len(chunk)] = chunk
+            idx += len(chunk)
+    trace.flush()
+    del trace
+    return count
+
+def writeTextTrace(f, chunks):
+    for chunk in chunks:
+        f.write("".join("{} {} {} {} {}\n".format(*event) for event in chunk.tolist()))
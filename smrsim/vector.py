@@ -0,0 +1,403 @@
+#!/usr/bin/env python
+#title           :vector.py
+#description     :Multi log simulator with its state in numpy arrays, simulating a block of events at a time
+#==============================================================================
+
+# coding: utf-8
+
+import hashlib
+import io
+import time
+from itertools import islice
+
+import numpy as np
+
+from smrsim.accel import kernels
+from smrsim.allocator import LogAllocator
+from smrsim.multilog import MultiLogSMR
+from smrsim.output import TraceWriter
+from smrsim.errors import HaltException
+from smrsim.trace import CHUNK_LINES, READ, eventChunk, readTrace, readTraceChunks
+
+# VectorMultiLogSMR simulates what MultiLogSMR does, to the byte, with the logs in numpy arrays: the fill,
+# band hits and extent count of every log, and one arena of the logged extents (blkno, blkcount, slot).
+# A log holds the extents of its slot: a log swap hands the slot over to the destination, a single clean
+# gives the log a new one, neither touches the arena. Dead extents are compacted away once they outnumber
+# the live ones (policy B, the only one with single cleans).
+# A chunk goes as in MultiLogSMR.feedChunk, and the log of every logged write is known before simulating
+# it: last_tail only changes on bulk requests (policy B maps the write itself). So the writes are taken a
+# window at a time, prefix sums per log give the fill before every write of the window and the first one
+# overflowing its log. The writes before it are appended at once, python only runs the clean or log swap.
+# With the compiled kernels (smrsim/accel.py) the writes are appended one by one in C up to the first
+# full log instead, and the output lines are formatted in C. No live index (config.live)
+FIRST_WINDOW = 1024 #writes scanned at once, doubled while no log overflows
+MIN_WINDOW = 64
+DENSE_GAP = 32 #writes between two full logs under which a window costs more than the writes one by one
+FIRST_ARENA = 1 << 16 #extents, the arena doubles when full
+COMPACT_EXTENTS = 1 << 16 #dead extents kept at least before a compaction
+AUTO_LOGSIZE = 1 << 22 #bytes, smallest log -E auto runs on this engine: about even with MultiLogSMR at 1 MiB, slower below
+
+def bandSpans(blkno, blkcount, band_size): #first band and band count of every extent, as markDirtyBands
+    first = blkno // band_size
+    return first, (blkcount + blkno % band_size + band_size - 1) // band_size
+
+def uniqueBands(first, count): #sorted bands of the [first, first + count) spans
+    end = np.cumsum(count)
+    hits = int(end[-1]) if len(end) > 0 else 0
+    return np.unique(np.repeat(first - (end - count), count) + np.arange(hits))
+
+def groupSums(keys, *values): #distinct keys and the sum of every value for each of them
+    order = np.argsort(keys, kind="mergesort")
+    keys = keys[order]
+    starts = np.flatnonzero(np.concatenate(([True], keys[1:] != keys[:-1])))
+    return keys[starts], [np.add.reduceat(value[order], starts) for value in values]
+
+def prefixBefore(keys, values): #sum of the values of the same key before every position
+    order = np.argsort(keys, kind="mergesort")
+    ordered = values[order]
+    ends = np.cumsum(ordered)
+    keys = keys[order]
+    starts = np.flatnonzero(np.concatenate(([True], keys[1:] != keys[:-1])))
+    before = ends - ordered
+    before -= np.repeat(before[starts], np.diff(np.append(starts, len(keys))))
+    result = np.empty_like(before)
+    result[order] = before
+    return result
+
+class VectorMultiLogSMR(MultiLogSMR):
+    def __init__(self, config, result, result_cleanup = None):
+        if config.live:
+            raise ValueError("the vector engine has no live index")
+        MultiLogSMR.__init__(self, config, result, result_cleanup)
+        nlogs = len(self.pcache)
+        self.nlogs = nlogs
+
+        # Logs, the lists and bitmaps of MultiLogSMR are not kept
+        self.pcache = self.log_bands = self.band_refs = self.dirty_disk = self.active_logs = None
+        self.pcache_fill = np.zeros(nlogs, dtype=np.int64)
+        self.pcache_hits = np.zeros(nlogs, dtype=np.int64)
+        self.pcache_extents = np.zeros(nlogs, dtype=np.int64) #extents held by each log
+        self.log_slot = np.arange(nlogs, dtype=np.int64) #slot of the extents of each log
+        self.next_slot = nlogs
+        self.allocator = LogAllocator(self.pcache_extents, config.placement)
+
+        # Extent arena, rows [0, extents) in logging order
+        self.extent_blkno = np.zeros(FIRST_ARENA, dtype=np.int64)
+        self.extent_blkcount = np.zeros(FIRST_ARENA, dtype=np.int64)
+        self.extent_slot = np.zeros(FIRST_ARENA, dtype=np.int64)
+        self.extents = 0
+        self.dead_extents = 0 #rows of slots no log holds
+
+    # --------Start of Computation Functions--------
+
+    def nextIdxPCacheN(self, n):
+        return int(self.pcache_fill[n])
+
+    def logRows(self, punit_idx = -1): #arena rows of log punit_idx, or of every log when -1
+        if punit_idx == -1:
+            if self.dead_extents == 0:
+                return np.arange(self.extents)
+            alive = np.zeros(self.next_slot, dtype=bool)
+            alive[self.log_slot] = True
+            return np.flatnonzero(alive[self.extent_slot[:self.extents]])
+        return np.flatnonzero(self.extent_slot[:self.extents] == self.log_slot[punit_idx])
+
+    def extentsPCacheN(self, n):
+        rows = self.logRows(n)
+        return zip(self.extent_blkno[rows].tolist(), self.extent_blkcount[rows].tolist())
+
+    def loggedExtents(self, punit_idx = -1):
+        if punit_idx == -1:
+            return self.extents - self.dead_extents
+        return int(self.pcache_extents[punit_idx])
+
+    def logBands(self, punit_idx = -1): #sorted dirty bands of log punit_idx, or of the whole disk when -1
+        rows = self.logRows(punit_idx)
+        return uniqueBands(*bandSpans(self.extent_blkno[rows], self.extent_blkcount[rows], self.BAND_SIZE))
+
+    def dirtyBandCount(self, n = -1):
+        return len(self.logBands(n))
+
+    # --------End of Computation Functions--------
+
+    # --------Start of Log Bookkeeping--------
+
+    def growArena(self, count): #room for count more extents
+        size = len(self.extent_blkno)
+        if self.extents + count <= size:
+            return
+        size = max(2 * size, self.extents + count)
+        for name in ("extent_blkno", "extent_blkcount", "extent_slot"):
+            column = np.zeros(size, dtype=np.int64)
+            column[:self.extents] = getattr(self, name)[:self.extents]
+            setattr(self, name, column)
+
+    def appendExtents(self, logs, blknos, blkcounts): #log the extents in order, logs: the log of each
+        count = len(logs)
+        if count == 0:
+            return
+        self.growArena(count)
+        start, stop = self.extents, self.extents + count
+        self.extent_blkno[start:stop] = blknos
+        self.extent_blkcount[start:stop] = blkcounts
+        self.extent_slot[start:stop] = self.log_slot[logs]
+        self.extents = stop
+        logs, (fill, hits, extents) = groupSums(logs, blkcounts, bandSpans(blknos, blkcounts, self.BAND_SIZE)[1], np.ones(count, dtype=np.int64))
+        self.pcache_fill[logs] += fill
+        self.pcache_hits[logs] += hits
+        self.pcache_extents[logs] += extents
+
+    def retireSlot(self, n): #log n gets a new empty slot
+        self.log_slot[n] = self.next_slot
+        self.next_slot += 1
+
+    def compactArena(self): #drop the rows of dead slots
+        rows = self.logRows()
+        for column in (self.extent_blkno, self.extent_blkcount, self.extent_slot):
+            column[:len(rows)] = column[rows]
+        self.extents = len(rows)
+        self.dead_extents = 0
+
+    def moveLog(self, src, dst):
+        for column in (self.pcache_fill, self.pcache_hits, self.pcache_extents, self.log_slot):
+            column[dst] = column[src]
+        self.pcache_fill[src] = self.pcache_hits[src] = self.pcache_extents[src] = 0
+        self.retireSlot(src)
+        self.allocator.release(src)
+
+    def clearPCache(self, punit_idx = -1):
+        if punit_idx == -1: #whole clean
+            for n in np.flatnonzero(self.pcache_extents).tolist():
+                self.allocator.release(n)
+            self.pcache_fill[:] = 0
+            self.pcache_hits[:] = 0
+            self.pcache_extents[:] = 0
+            self.extents = 0
+            self.dead_extents = 0
+        else: #single clean
+            self.dead_extents += int(self.pcache_extents[punit_idx])
+            self.pcache_fill[punit_idx] = self.pcache_hits[punit_idx] = self.pcache_extents[punit_idx] = 0
+            self.retireSlot(punit_idx)
+            self.allocator.release(punit_idx)
+            if self.dead_extents > max(COMPACT_EXTENTS, self.extents - self.dead_extents):
+                self.compactArena()
+
+    # --------End of Log Bookkeeping--------
+
+    # --------Start of Snapshots--------
+
+    def getState(self): #same state as MultiLogSMR.getState, snapshots of both engines hold the same arrays
+        rows = self.logRows()
+        slot_log = np.full(self.next_slot, -1, dtype=np.int64)
+        slot_log[self.log_slot] = np.arange(self.nlogs)
+        rows = rows[np.argsort(slot_log[self.extent_slot[rows]], kind="mergesort")] #by log, in logging order
+        extents = np.empty(2 * len(rows), dtype='l')
+        extents[0::2] = self.extent_blkno[rows]
+        extents[1::2] = self.extent_blkcount[rows]
+        arrays = {"pcache": extents, "pcache_lengths": 2 * self.pcache_extents}
+        return dict((name, getattr(self, name)) for name in self.STATE), arrays
+
+    def setState(self, scalars, arrays):
+        lengths = arrays["pcache_lengths"]
+        if len(lengths) != self.nlogs:
+            raise ValueError("snapshot of a disk of %d logs, this disk has %d" % (len(lengths), self.nlogs))
+        for name in self.STATE:
+            setattr(self, name, scalars[name])
+        extents = arrays["pcache"].astype(np.int64)
+        self.appendExtents(np.repeat(np.arange(self.nlogs), lengths // 2), extents[0::2], extents[1::2])
+
+    # --------End of Snapshots--------
+
+    # --------Start of Read,Write,Clean--------
+
+    def cleanPCache(self, time, devno, punit_idx = -1):
+        #METRICS part - total dirty band, used for average dirty bands per clean
+        if punit_idx == -1: #whole clean
+            self.totalDirtyBands += int(self.pcache_hits.sum())
+        else: #single clean
+            self.totalDirtyBands += int(self.pcache_hits[punit_idx])
+        bands = self.logBands(punit_idx)
+        self.writeCleanBands(time, devno, bands * self.BAND_SIZE + (bands // self.band_unit + 1) * self.PCACHE_SIZE)
+        self.clearPCache(punit_idx)
+
+    def feed(self, events): #event tuples, a chunk at a time
+        events = iter(events)
+        while True:
+            block = list(islice(events, CHUNK_LINES))
+            if not block:
+                break
+            self.feedChunk(eventChunk(block))
+
+    def feedChunk(self, chunk):
+        size = len(chunk)
+        if size == 0:
+            return
+        bulk, tail = self.bulkRequests(chunk)
+        blknos = chunk["blkno"].astype(np.int64)
+        blkcounts = chunk["blkcount"].astype(np.int64)
+        disk = self.computeDiskBlkNo(blknos) #output blkno of every request, the bulk ones already
+        tails = disk + blkcounts
+        setters = np.maximum.accumulate(np.where(tail, np.arange(size), -1)) #last tail setter so far
+
+        # log of every logged write
+        writes = np.flatnonzero(~bulk)
+        if self.policy == "B":
+            points = disk[writes]
+        else: #policy A or C or shelter, the last tail before the write
+            before = np.concatenate(([-1], setters[:-1]))[writes]
+            points = np.where(before >= 0, tails[before], self.last_tail)
+        logs = points // self.diskset_size
+        write_blknos = blknos[writes]
+        write_counts = blkcounts[writes]
+
+        columns = (np.ascontiguousarray(chunk["time"]), np.ascontiguousarray(chunk["devno"]), blkcounts, np.ascontiguousarray(chunk["flag"]), tails, setters)
+        emitted = 0 #requests written out
+        start, count, window = 0, len(writes), FIRST_WINDOW
+        last_full = -DENSE_GAP #write of the last full log
+        PCACHE_SIZE = self.PCACHE_SIZE
+        while start < count:
+            if kernels is not None: #compiled append up to the first write overflowing its log
+                self.growArena(count - start)
+                end = kernels.logWrites(start, writes, logs, write_blknos, write_counts, disk, self.pcache_fill, self.pcache_hits,
+                                        self.pcache_extents, self.log_slot, self.extent_blkno, self.extent_blkcount, self.extent_slot,
+                                        self.extents, PCACHE_SIZE, self.diskset_size, self.BAND_SIZE)
+                #METRICS part - writes and sectors put in persistent cache
+                self.writesPutInPCache += end - start
+                self.sectorsPutInPCache += int(write_counts[start:end].sum())
+                self.extents += end - start
+                if end == count:
+                    break
+                n = int(logs[end])
+                emitted = self.fullLog(columns, disk, emitted, int(writes[end]), n, int(write_counts[end]))
+                self.logWrite(disk, int(writes[end]), n, int(write_blknos[end]), int(write_counts[end]))
+                start = end + 1
+                continue
+
+            if start - last_full < DENSE_GAP: #full logs every few writes, one write at a time
+                n, blkcount = int(logs[start]), int(write_counts[start])
+                if self.pcache_fill[n] + blkcount > PCACHE_SIZE:
+                    emitted = self.fullLog(columns, disk, emitted, int(writes[start]), n, blkcount)
+                    last_full = start
+                else:
+                    self.countWrite(blkcount)
+                self.logWrite(disk, int(writes[start]), n, int(write_blknos[start]), blkcount)
+                start += 1
+                window = MIN_WINDOW
+                continue
+
+            stop = min(count, start + window)
+            fill = self.pcache_fill[logs[start:stop]] + prefixBefore(logs[start:stop], write_counts[start:stop])
+            over = np.flatnonzero(fill + write_counts[start:stop] > PCACHE_SIZE)
+            end = start + int(over[0]) if len(over) > 0 else stop
+            if end > start:
+                self.logWrites(disk, writes[start:end], logs[start:end], write_blknos[start:end], write_counts[start:end], fill[:end - start])
+            if end == stop:
+                start, window = stop, 2 * window
+                continue
+
+            # the write at end has no room left in its log
+            n = int(logs[end])
+            emitted = self.fullLog(columns, disk, emitted, int(writes[end]), n, int(write_counts[end]))
+            self.logWrite(disk, int(writes[end]), n, int(write_blknos[end]), int(write_counts[end]))
+            start, window, last_full = end + 1, max(MIN_WINDOW, 2 * (end - last_full)), end
+        self.emitRequests(columns, disk, emitted, size)
+
+        if setters[-1] >= 0:
+            self.last_tail = int(tails[setters[-1]])
+        self.totalRead += int(np.count_nonzero(chunk["flag"] == READ))
+
+    def fullLog(self, columns, disk, emitted, position, n, blkcount): #the write at position has no room left in log n
+        # counted before the clean or log swap as in handleDefaultWrite, a halt leaves the counters, last_tail
+        # and totalRead of the requests before position as MultiLogSMR does
+        self.countWrite(blkcount)
+        emitted = self.emitRequests(columns, disk, emitted, position)
+        try:
+            self.handleFullLog(columns[0][position].item(), columns[1][position].item(), n)
+        except HaltException:
+            tails, setters = columns[4:]
+            if position > 0 and setters[position - 1] >= 0:
+                self.last_tail = int(tails[setters[position - 1]])
+            self.totalRead += int(np.count_nonzero(columns[3][:position] == READ))
+            raise
+        return emitted
+
+    def countWrite(self, blkcount):
+        #METRICS part - writes and sectors put in persistent cache
+        self.writesPutInPCache += 1
+        self.sectorsPutInPCache += blkcount
+
+    def logWrites(self, disk, positions, logs, blknos, blkcounts, fill): #writes of a chunk to their logs, fill: before each
+        #METRICS part - writes and sectors put in persistent cache
+        self.writesPutInPCache += len(positions)
+        self.sectorsPutInPCache += int(blkcounts.sum())
+        disk[positions] = logs * self.diskset_size + fill #write target
+        self.appendExtents(logs, blknos, blkcounts)
+
+    def logWrite(self, disk, position, n, blkno, blkcount): #logWrites of a single write, counted by the caller (countWrite)
+        disk[position] = n * self.diskset_size + self.pcache_fill[n]
+        self.growArena(1)
+        row = self.extents
+        self.extent_blkno[row] = blkno
+        self.extent_blkcount[row] = blkcount
+        self.extent_slot[row] = self.log_slot[n]
+        self.extents = row + 1
+        self.pcache_fill[n] += blkcount
+        self.pcache_hits[n] += (blkcount + blkno % self.BAND_SIZE + self.BAND_SIZE - 1) // self.BAND_SIZE
+        self.pcache_extents[n] += 1
+
+    def emitRequests(self, columns, disk, start, stop): #output lines of the requests start to stop of a chunk
+        if stop > start:
+            times, devnos, blkcounts, flags = columns[:4]
+            self.result.writeArrays(times[start:stop], devnos[start:stop], disk[start:stop], blkcounts[start:stop], flags[start:stop])
+        return stop
+
+    # --------End of Read,Write,Clean--------
+
+# --------Differential check--------
+
+class DigestFile(io.RawIOBase): #write only file keeping the md5 and size of what it gets, to compare outputs
+    def __init__(self):
+        io.RawIOBase.__init__(self)
+        self.md5 = hashlib.md5()
+        self.size = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self.md5.update(data)
+        self.size += len(data)
+        return len(data)
+
+ENGINES = [("scalar", MultiLogSMR), ("vector", VectorMultiLogSMR)]
+
+def runEngine(engine, config, trace, binary = False, split = False, chunk_lines = CHUNK_LINES):
+    # run of one engine, reduced to what the engines must agree on: outputs, summary, final state
+    files = [DigestFile() for _ in range(2 if split else 1)]
+    sim = dict(ENGINES)[engine](config, *[TraceWriter(f, binary=binary) for f in files])
+    start = time.time()
+    error = None
+    try:
+        if engine == "scalar":
+            sim.feed(readTrace(trace, chunk_lines))
+        else:
+            for chunk in readTraceChunks(trace, chunk_lines):
+                sim.feedChunk(chunk)
+        sim.finish()
+    except HaltException as e: #both engines must stop at the same request
+        error = str(e)
+    sim.flushOutput()
+    scalars, arrays = sim.getState()
+    return {"seconds": time.time() - start, "error": error, "outputs": [(f.md5.hexdigest(), f.size) for f in files],
+            "summary": sim.summary(), "state": scalars, "arrays": arrays}
+
+def compareEngines(config, trace, binary = False, split = False, chunk_lines = CHUNK_LINES):
+    # row of a differential run of the reference (scalar) engine and the vector one, "mismatch" lists what differs
+    runs = dict((engine, runEngine(engine, config, trace, binary, split, chunk_lines)) for engine, _ in ENGINES)
+    scalar, vector = runs["scalar"], runs["vector"]
+    mismatch = [key for key in ("error", "outputs", "summary", "state") if scalar[key] != vector[key]]
+    if sorted(scalar["arrays"]) != sorted(vector["arrays"]) or \
+       any(not np.array_equal(scalar["arrays"][name], vector["arrays"][name]) for name in scalar["arrays"]):
+        mismatch.append("arrays")
+    return {"mismatch": mismatch, "error": scalar["error"], "scalar_seconds": scalar["seconds"], "vector_seconds": vector["seconds"],
+            "output_bytes": sum(size for _, size in scalar["outputs"]), "summary": scalar["summary"]}
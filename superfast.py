@@ -9,9 +9,11 @@
 import argparse
 import sys
 import random
+
+from smrsim import readTrace
 #==============================================================================
 parser = argparse.ArgumentParser()
-parser.add_argument("file", help="trace file to process", nargs='?', type=argparse.FileType('r'), default=sys.stdin)
+parser.add_argument("file", help="trace file to process, text or binary (.npy)", nargs='?', type=argparse.FileType('r'), default=sys.stdin)
 args = parser.parse_args()
 #==============================================================================
 KB = 1024;
@@ -24,9 +26,8 @@ result = open('out/' + str(sys.argv[1]).strip().split('/')[-1].split('.')[0] + '
 #==============================================================================
 
 if __name__ == "__main__":
-    for line in args.file:
-        token = line.split(" ")
-        offset = str(random.randint(0, max_offset - int(token[3].strip())))
-        result.write("{} {} {} {} {}\n".format(token[0], token[1], offset, token[3].strip(), token[4].strip()))
+    for time, devno, blkno, blkcount, flag in readTrace(args.file):
+        offset = str(random.randint(0, max_offset - blkcount))
+        result.write("{} {} {} {} {}\n".format(time, devno, offset, blkcount, flag))
         
         
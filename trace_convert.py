@@ -0,0 +1,41 @@
+#!/usr/bin/env python
+#title           :trace_convert.py
+#description     :Convert a trace between the text format and the binary (.npy) format,
+#                 or a binary (.cols) or mapped (.rec) simulator output to text
+#==============================================================================
+
+# coding: utf-8
+
+import argparse
+import sys
+
+from smrsim.compress import openText
+from smrsim.output import isBinaryOutput, isMappedOutput, readOutputBlocks, writeTextOutput, writeTextRecords
+from smrsim.trace import isBinaryTrace, readTraceChunks, writeBinaryTrace, writeTextTrace
+
+#==============================================================================
+parser = argparse.ArgumentParser()
+parser.add_argument("src", help="trace to convert, text (compressed if .gz, .zst or .lz4) or binary (.npy), or a binary (.cols) or mapped (.rec) output")
+parser.add_argument("dst", help="converted trace, binary if it ends with .npy, compressed text if .gz, .zst or .lz4")
+parser.add_argument("-j","--jobs", help="worker processes formatting a mapped output, default one per cpu", type=int, default=None)
+#==============================================================================
+
+def main():
+    args = parser.parse_args()
+    if isMappedOutput(args.src):
+        with openText(args.dst, "w") as result:
+            writeTextRecords(result, args.src, args.jobs)
+    elif isBinaryOutput(args.src):
+        with openText(args.dst, "w") as result:
+            writeTextOutput(result, readOutputBlocks(args.src))
+    elif isBinaryTrace(args.dst):
+        if isBinaryTrace(args.src):
+            sys.exit("source is already a binary trace")
+        count = writeBinaryTrace(args.dst, args.src)
+        print("Wrote " + str(count) + " events to " + args.dst)
+    else:
+        with openText(args.dst, "w") as result:
+            writeTextTrace(result, readTraceChunks(args.src))
+
+if __name__ == "__main__":
+    main()